@@ -1,451 +1,4594 @@
-import sys
-import time
-import re
-import random
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTextEdit, QLineEdit, QVBoxLayout, QPushButton, QWidget, \
-    QHBoxLayout, QInputDialog, QMessageBox, QAction
-from PyQt5.QtGui import QIcon, QTextCursor, QFont
-from PyQt5.QtCore import Qt, QTimer
-from datetime import datetime, timedelta
-import os
-import pandas as pd
-from nltk.chat.util import Chat, reflections
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-
-class HealthPredictor:
-    def __init__(self, dataset_path):
-        # Load and preprocess dataset
-        self.dataset = pd.read_csv(dataset_path)
-        self.preprocess_dataset()
-
-        # Split dataset into features and labels
-        # Exclude 'Outcome variable' from the features (X)
-        X = self.dataset.drop(columns=['Disease', 'Medical advice', 'Outcome variable'])
-        y = self.dataset['Disease']
-
-        # Split data into training and testing sets
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        # Train a RandomForestClassifier
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
-
-    def preprocess_dataset(self):
-        # Mapping categorical columns to numerical values
-        self.dataset['Fever'] = self.dataset['Fever'].map({'yes': 1, 'no': 0})
-        self.dataset['Cough'] = self.dataset['Cough'].map({'yes': 1, 'no': 0})
-        self.dataset['Fatigue'] = self.dataset['Fatigue'].map({'yes': 1, 'no': 0})
-        self.dataset['Difficulty breathing'] = self.dataset['Difficulty breathing'].map({'yes': 1, 'no': 0})
-        self.dataset['Age'] = self.dataset['Age'].fillna(self.dataset['Age'].median())  # Fill missing values
-        scaler = StandardScaler()  # Initialize scaler
-        self.dataset['Age'] = scaler.fit_transform(self.dataset[['Age']])
-        self.dataset['Gender'] = self.dataset['Gender'].map({'male': 1, 'female': 0})
-        self.dataset['Blood pressure'] = self.dataset['Blood pressure'].map({'low': 0, 'normal': 1, 'high': 2})
-        self.dataset['Cholesterol level'] = self.dataset['Cholesterol level'].map({'low': 0, 'normal': 1, 'high': 2})
-
-        # Handle any other columns that have non-numeric values
-        self.dataset['Outcome variable'] = self.dataset['Outcome variable'].map({'Positive': 1, 'Negative': 0, 'Borderline': 2})
-
-    def predict_disease(self, patient_data):
-        # Convert patient data to match dataset format (exclude 'Outcome variable')
-        patient_df = pd.DataFrame([patient_data])
-
-        # Predict the disease
-        predicted_disease = self.model.predict(patient_df)[0]
-
-        # Get medical advice corresponding to the predicted disease
-        advice = self.dataset[self.dataset['Disease'] == predicted_disease]['Medical advice'].values[0]
-
-        return predicted_disease, advice
-
-# Define patterns and responses for NLTK chatbot
-pairs = [
-    [r"my name is (.*)", ["Hello %1, how can I assist you today? you can type 'login' if you need a Health Assistant 🧑‍⚕️.."]],
-    [r"hi|hey|hello", ["Hello, how can I help you? you can type 'login' if you need a Health Assistant 🧑‍⚕️..", "Hey there! What can I do for you? you can type 'login' if you need a Health Assistant 🧑‍⚕️..", "Hi! How can I assist you today? you can type 'login' if you need a Health Assistant 🧑‍⚕️.."]],
-    [r"i need help|help", ["I'm here to take care of you 😊. What's the problem?🤔🩺", "What happened 😨, what can i do for you?"]],
-    [r"i have fever|i think im having a fever|i got fever|fever", ["For common fever, 🛌 rest, stay hydrated with fluids 🥤, use over-the-counter medications like paracetamol or ibuprofen 💊 to reduce fever, and apply a cool compress ❄ or take a lukewarm bath 🛁 to lower body temperature. Consult a healthcare professional if symptoms persist or worsen"]],
-    [r"i have cough|im having a cough|i got cough|cough", ["For common cough, 🥤 stay hydrated, use a humidifier or inhale steam 🌫 to soothe the throat, try over-the-counter cough syrups or lozenges 💊, and rest well 🛌. If the cough persists for more than a week or is accompanied by other symptoms, consult a healthcare professional"]],
-    [r"what is your name?|what are you|who are you|whats your name", ["I am a chatbot created to assist you 🤖. You can call me Health Buddy 🩺😊","I am a chatbot 🤖. My developers call me Health Buddy 🩺😊", "I am an AI Health Assistant, You can call me Health Buddy 🩺😊"]],
-    [r"how are you?", ["I'm good enough to assist you and help you with your health 😊🩺"]],
-    [r"can you help me with (.*)", ["Sure, I can help you with %1. Please provide more details."]],
-    [r"sorry (.*)", ["It's okay. How can I assist you?"]],
-    [r"sorry", ["It's okay. How can I assist you?"]],
-    [r"health report|view health report|show health report|update health report|update health check|update report", ["You need to login first to get those information, please type 'login'","To access those information, please type 'login'","First login to get those information, please type 'login'"]],
-    [r"thank you|thanks", ["You're welcome!😊", "No problem!😊", "Happy to help!😊"]],
-    [r"login", ["Ok, Please enter your name...", "Got it, Please enter your name..."]],
-    [r"bye|quit|see you later|goodbye", ["Bye! Have a great day!😊", "Goodbye!😊"]],
-    [r"i do not understand|i do not understood|i didnt understand|i didnt understood|i did not understand", ["I am sorry for the Inconvenience, My skill-set is still under development. But you can explore other features, just type 'login' to access Health Assistants"]],
-    [r"(.*)", ["I'm sorry, I don't understand that. Can you rephrase?", "Could you please elaborate on that?"]]
-]
-
-
-# Define the NLTK-based chatbot class
-class RuleBasedChatbot:
-    def __init__(self, pairs):
-        self.chat = Chat(pairs, reflections)
-
-    def respond(self, user_input):
-        return self.chat.respond(user_input)
-
-
-# Initialize the NLTK-based chatbot
-chatbot = RuleBasedChatbot(pairs)
-
-# ChatbotApp Class Initialisation
-class ChatbotApp(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.initUI()
-        self.patient_name = None
-        self.medicine_reminders = []
-        self.appointments = []
-        self.medical_advice_list = self.load_medical_advice()
-        self.predictor = HealthPredictor('Disease_and_Medical_Advice_Analysis.csv')
-        self.is_dark_mode = True
-        self.set_theme()
-
-    def initUI(self):
-        self.setWindowTitle("Health Buddy AI Virtual Assistant")
-        self.setWindowIcon(QIcon("HealthBuddyLogo.jpeg"))  # logo image path
-
-
-
-        monospace_font = QFont("Courier New", 15)
-        monospace_font_chathistory = QFont("Courier New", 35)
-
-        self.chat_history = QTextEdit(self)
-        self.chat_history.setReadOnly(True)
-        self.chat_history.setTextInteractionFlags(Qt.TextBrowserInteraction)
-
-        self.chat_history.setFont(monospace_font_chathistory)
-
-        self.user_input = QLineEdit(self)
-        self.user_input.setPlaceholderText("Type your message here...")
-
-
-        self.user_input.setFont(monospace_font)
-        self.user_input.returnPressed.connect(self.handle_input)
-
-        self.send_button = QPushButton("Send", self)
-
-
-        self.send_button.setFont(monospace_font)
-        self.send_button.clicked.connect(self.handle_input)
-
-        input_layout = QHBoxLayout()
-        input_layout.addWidget(self.user_input)
-        input_layout.addWidget(self.send_button)
-
-        layout = QVBoxLayout()
-        layout.addWidget(self.chat_history)
-        layout.addLayout(input_layout)
-
-        container = QWidget()
-        container.setLayout(layout)
-        self.setCentralWidget(container)
-
-        # Menu bar for Future Updates
-        """menubar = self.menuBar()
-        viewMenu = menubar.addMenu('View')"""
-
-        toggleThemeAction = QAction('Toggle Theme', self)
-        toggleThemeAction.triggered.connect(self.toggle_theme)
-        #viewMenu.addAction(toggleThemeAction)
-
-        self.append_message("Bot: Hi! I am Your Virtual AI Doctor, What can I help you with today? You can type 'login' for Medical Assistant 🧑‍⚕️", "bot")
-        self.showMaximized()
-
-    def set_theme(self):
-        if self.is_dark_mode:
-            self.setStyleSheet("""
-                QMainWindow {background-color: #1e1e1e;}
-                QTextEdit {background-color: #1e1e1e;color: #ffffff;}
-                QLineEdit {background-color: #333333;color: #ffffff;}
-                QPushButton {background-color: #333333;color: #ffffff;}""")
-        else:
-            self.setStyleSheet("""
-                QMainWindow {background-color: #ffffff;}
-                QTextEdit {background-color: #ffffff;color: #000000;}
-                QLineEdit {background-color: #f0f0f0color: #000000;}
-                QPushButton {background-color: #f0f0f0;color: #000000;}""")
-
-    def toggle_theme(self):
-        # Toggle Theme for Dark Mode
-        self.is_dark_mode = not self.is_dark_mode
-        self.set_theme()
-    def load_medical_advice(self):
-        # Load the medical advice from the CSV file
-        try:
-            df = pd.read_csv('MedicalAdvices.csv')
-            return df['Medical Advices'].tolist()
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f"Failed to load medical advice: {e}")
-            return []
-
-    def handle_input(self):
-        user_message = self.user_input.text().strip()
-        if user_message:
-            self.append_message(f"User: {user_message}", "user")
-            self.user_input.clear()
-
-            bot_response = self.get_bot_response(user_message)
-            self.append_message(f"Bot: {bot_response}", "bot")
-
-    def append_message(self, message, sender):
-        cursor = self.chat_history.textCursor()
-        cursor.movePosition(QTextCursor.End)
-
-        font_size = "25px"
-        cursor.insertHtml(
-            f'<div style="text-align: left; color: {"white"}; font-size: {font_size};">{message}</div><br>')
-
-        self.chat_history.setTextCursor(cursor)
-        self.chat_history.ensureCursorVisible()
-
-    def get_bot_response(self, message):
-        message = message.lower().strip()  # Normalize the user input
-
-        # Handle general interactions first
-        response = chatbot.respond(message)
-        if response and not ("login" in message or self.patient_name):
-            return response
-
-        # Handle the login process for user verification
-        if "login" in message or not self.patient_name:
-            self.patient_name = self.get_patient_name()
-            if self.patient_name:
-                if self.check_existing_patient(self.patient_name):
-                    # Welcome back message for existing users
-                    return (
-                        f"Welcome back, {self.patient_name}!\n"
-                        "What would you like to do today?\n"
-                        "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-
-                    )
-                else:
-                    # Greeting message for new users
-                    return (
-                        f"Hello {self.patient_name}, it seems you're new here.\n"
-                        "What would you like to explore today?\n"
-                        "(Options: health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-                    )
-            else:
-                return "Please enter your name to log in."
-
-        # Ensure the user is logged in before handling further interactions
-        if not self.patient_name:
-            return "Please log in first by typing 'login'."
-
-        # Logic for existing users: handle each command after login
-        if "view health report" in message:
-            if self.check_existing_patient(self.patient_name):
-                return self.view_health_report()
-            else:
-                return (
-                    "No health report found. Please complete a health check first before viewing your health report.\n"
-                    "Type 'health check' to get started."
-                )
-
-        elif "health check" in message:
-            responses = self.collect_health_data()
-            self.save_health_data(responses)
-            return (
-                "Thank you for providing your details. Your health data has been recorded 😊.\n"
-                "Explore more options:\n"
-                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-            )
-
-        elif "update health check" in message:
-            responses = self.collect_health_data()
-            self.save_health_data(responses)
-            return (
-                "Your health check details have been updated 😊.\n"
-                "What would you like to do next?\n"
-                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-            )
-
-        elif "daily medical advice" in message:
-            return self.get_random_medical_advice()
-
-        elif "medicine reminder" in message:
-            self.add_medicine_reminder()
-            return (
-                "Medicine reminder has been set 👍.\n"
-                "What would you like to do next?\n"
-                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-            )
-
-        elif "doctor appointment" in message:
-            self.add_doctor_appointment()
-            return (
-                "Doctor appointment has been scheduled 👍.\n"
-                "What would you like to do next?\n"
-                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
-            )
-
-        elif "exit" in message or "close" in message:
-            self.close()
-            return "Closing the application. Have a great day! 👋"
-
-        return "I'm sorry, I didn't understand that. Could you try rephrasing?"
-
-    def get_patient_name(self):
-        name, ok = QInputDialog.getText(self, 'Patient Name', 'Please enter your name:')
-        if ok and re.match("^[A-Za-z ]*$", name):
-            return name
-        else:
-            QMessageBox.warning(self, 'Invalid Input',
-                                'Please enter a valid name without numbers or special characters.')
-            return None
-
-    def check_existing_patient(self, name):
-        return os.path.exists(f"{name}_health_report.txt")
-
-    def collect_health_data(self):
-        responses = {}
-
-        day_response, ok = QInputDialog.getText(self, 'Day Info', 'How did your day go?')
-        if ok:
-            responses['day'] = day_response
-
-        symptoms = ["Fever", "Cough", "Fatigue", "Difficulty Breathing"]
-        for symptom in symptoms:
-            while True:
-                response, ok = QInputDialog.getText(self, 'Symptom Check', f"Do you have any {symptom}? (yes/no)")
-                if ok and response.lower() in ["yes", "no"]:
-                    responses[symptom] = response.lower()
-                    break
-                else:
-                    QMessageBox.warning(self, 'Invalid Input', "Please enter 'yes' or 'no'.")
-
-        symptoms2 = ["Age", "Gender", "Blood Pressure", "Cholesterol Level"]
-        for symptom2 in symptoms2:
-            while True:
-                try:
-                    if symptom2 == "Blood Pressure":
-                        response2, ok = QInputDialog.getText(self, 'Blood Pressure', f"What is your {symptom2}? (low | normal | high)")
-                        if ok and response2.lower() in ["low", "normal", "high"]:
-                            responses[symptom2] = response2
-                            break
-                        else:
-                            QMessageBox.warning(self, 'Invalid Input', "Please enter only 'low' or 'normal' or 'high' for blood pressure")
-                    elif symptom2 == "Cholesterol Level":
-                        response2, ok = QInputDialog.getText(self, 'Cholesterol Level', f"What is your {symptom2}? (low | normal | high)")
-                        if ok and response2.lower() in ["low", "normal", "high"]:
-                            responses[symptom2] = response2
-                            break
-                        else:
-                            QMessageBox.warning(self, 'Invalid Input', "Please enter only 'low' or 'normal' or 'high' for cholesterol level")
-                    elif symptom2 == "Gender":
-                        response2, ok = QInputDialog.getText(self, 'Gender', f"What is your {symptom2}? (male/female)")
-                        if ok and response2.lower() in ["male", "female"]:
-                            responses[symptom2] = response2.lower()
-                            break
-                        else:
-                            QMessageBox.warning(self, 'Invalid Input', "Please enter 'male' or 'female'.")
-                    else:
-                        response2, ok = QInputDialog.getText(self, symptom2, f"What is your {symptom2}? (Answer)")
-                        responses[symptom2] = int(response2)
-                        break
-                except ValueError:
-                    QMessageBox.warning(self, 'Invalid Input', "Please enter a valid number.")
-
-        return responses
-
-    def save_health_data(self, responses):
-        # Create an instance of HealthPredictor
-        predictor = HealthPredictor('Disease_and_Medical_Advice_Analysis.csv')
-
-        # Prepare patient data from responses
-        patient_data = {
-            'Fever': 1 if responses.get('Fever') == 'yes' else 0,
-            'Cough': 1 if responses.get('Cough') == 'yes' else 0,
-            'Fatigue': 1 if responses.get('Fatigue') == 'yes' else 0,
-            'Difficulty breathing': 1 if responses.get('Difficulty breathing') == 'yes' else 0,
-            'Age': int(responses.get('Age', 0)),
-            'Gender': 1 if responses.get('Gender') == 'male' else 0,
-            'Blood pressure': {'low': 0, 'normal': 1, 'high': 2}.get(responses.get('Blood Pressure'), 0),
-            'Cholesterol level': {'low': 0, 'normal': 1, 'high': 2}.get(responses.get('Cholesterol Level'), 0)
-        }
-
-        # Predict disease and get medical advice
-        predicted_disease, medical_advice = predictor.predict_disease(patient_data)
-
-        # Save health data and prediction results to file
-        file_name = f"{self.patient_name}_health_report.txt"
-        with open(file_name, 'w') as file:
-            file.write(f"Health Report for {self.patient_name}\n")
-            file.write(f"Date: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            file.write("\n")
-            for question, answer in responses.items():
-                file.write(f"{question.capitalize()}: {answer}\n")
-            file.write("\n")
-            file.write(f"Predicted Disease: {predicted_disease}\n")
-            file.write(f"Medical Advice: {medical_advice}\n")
-
-    def view_health_report(self):
-        try:
-            with open(f"{self.patient_name}_health_report.txt", "r") as file:
-                report = file.read()
-            return f"Here is your health report:\n\n{report}"
-        except FileNotFoundError:
-            return "No health report found."
-
-    def get_random_medical_advice(self):
-        if self.medical_advice_list:
-            advice = random.choice(self.medical_advice_list)
-            return f"Here's a piece of medical advice for you:\n\n{advice}"
-        else:
-            return "Sorry, no medical advice is available at the moment."
-
-    def add_medicine_reminder(self):
-        med_name, ok = QInputDialog.getText(self, 'Medicine Name', 'Enter the name of the medicine 💊:')
-        if ok and med_name:
-            time_input, ok = QInputDialog.getText(self, 'Reminder Time', 'Enter the reminder time (HH:MM)⏰:')
-            if ok and re.match("^[0-2][0-9]:[0-5][0-9]$", time_input):
-                reminder_time = datetime.strptime(time_input, '%H:%M').time()
-                self.medicine_reminders.append((med_name, reminder_time))
-                self.schedule_reminder(med_name, reminder_time)
-
-    def schedule_reminder(self, med_name, reminder_time):
-        now = datetime.now()
-        today_reminder_time = datetime.combine(now.date(), reminder_time)
-        if now > today_reminder_time:
-            today_reminder_time += timedelta(days=1)
-
-        delay = (today_reminder_time - now).total_seconds()
-
-        QTimer.singleShot(int(delay * 1000), lambda: self.show_reminder_popup(med_name))
-
-    def show_reminder_popup(self, med_name):
-        QMessageBox.information(self, 'Medicine Reminder', f"Time to take your medicine: {med_name}")
-
-    def add_doctor_appointment(self):
-        doctor, ok = QInputDialog.getText(self, 'Doctor Appointment', 'Enter the doctor name 👨‍⚕️:')
-        if ok:
-            time_str, ok = QInputDialog.getText(self, 'Doctor Appointment', 'Enter the appointment time (HH:MM AM/PM)⏰:')
-            if ok and re.match(r'^\d{2}:\d{2} [APap][Mm]$', time_str):
-                self.appointments.append((doctor, time_str))
-                self.schedule_appointment(doctor, time_str)
-            else:
-                QMessageBox.warning(self, 'Invalid Input', 'Please enter a valid time in HH:MM AM/PM format.')
-    def schedule_appointment(self, doctor, time_str):
-        now = datetime.now()
-        appointment_time = datetime.strptime(time_str, '%I:%M %p')
-        appointment_time = now.replace(hour=appointment_time.hour, minute=appointment_time.minute, second=0, microsecond=0)
-        if appointment_time < now:
-            appointment_time += timedelta(days=1)
-        delay = (appointment_time - now).total_seconds()
-        QTimer.singleShot(int(delay * 1000), lambda: self.show_appointment_reminder(doctor))
-
-    def show_appointment_reminder(self, doctor):
-        QMessageBox.information(self, 'Appointment Reminder', f"You have an appointment with Dr. {doctor}.")
-
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    chatbot_app = ChatbotApp()
-    chatbot_app.show()
-    sys.exit(app.exec_())
+import sys
+import time
+
+# Taken before the heavy imports so the startup report covers the whole module load
+STARTUP_STARTED = time.perf_counter()
+
+import re
+import random
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTextEdit, QLineEdit, QVBoxLayout, QPushButton, QWidget, \
+    QHBoxLayout, QMessageBox, QAction, QLabel, QListView, QStyledItemDelegate, QAbstractItemView, QStyle
+from PyQt5.QtGui import QIcon, QTextCursor, QFont, QFontMetrics, QPalette, QKeySequence
+from PyQt5.QtCore import Qt, QTimer, QThread, QThreadPool, QRunnable, QObject, QEventLoop, pyqtSignal, \
+    QAbstractListModel, QModelIndex, QRect, QSize, QEvent
+from datetime import datetime, timedelta
+import os
+import hashlib
+import pickle
+import argparse
+import itertools
+import importlib
+import json
+import subprocess
+import statistics
+import threading
+import asyncio
+import concurrent.futures
+import tempfile
+import uuid
+import glob
+import html
+import sqlite3
+import heapq
+import bisect
+import functools
+import copy
+import math
+import collections
+import atexit
+import signal
+
+
+class LazyModule:
+    # Stands in for a heavy module and imports it on first attribute access
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# pandas, NumPy and scikit-learn cost seconds to import, so the window comes up before they load
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+DATASET_PATH = 'Disease_and_Medical_Advice_Analysis.csv'
+# General health tips for the daily advice rotation
+ADVICE_TIPS_PATH = 'MedicalAdvices.csv'
+
+# Column order the model is trained on
+FEATURE_COLUMNS = ['Fever', 'Cough', 'Fatigue', 'Difficulty breathing', 'Age', 'Gender', 'Blood pressure', 'Cholesterol level']
+
+# Every health check ever recorded, newest last
+RECORD_STORE_PATH = 'healthbuddy.db'
+
+# Training log columns in the record store, keyed by dataset column
+OUTCOME_COLUMNS = {
+    'Fever': ('fever', 'TEXT'),
+    'Cough': ('cough', 'TEXT'),
+    'Fatigue': ('fatigue', 'TEXT'),
+    'Difficulty breathing': ('difficulty_breathing', 'TEXT'),
+    'Age': ('age', 'REAL'),
+    'Gender': ('gender', 'TEXT'),
+    'Blood pressure': ('blood_pressure', 'TEXT'),
+    'Cholesterol level': ('cholesterol_level', 'TEXT'),
+}
+
+# Trained models are cached here, one pickle per dataset version
+MODEL_STORE_DIR = 'model_store'
+# Bump whenever the artifact layout or the training recipe changes
+MODEL_FORMAT_VERSION = 4
+
+
+def hash_files(paths):
+    # sha256 over the concatenated bytes of the files
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_name(dataset_path):
+    # Files derived from a CSV are named after it, so work on one CSV never removes another's files
+    return re.sub(r'[^A-Za-z0-9_]+', '_', os.path.splitext(os.path.basename(dataset_path))[0])
+
+
+class ModelStore:
+    def __init__(self, store_dir=MODEL_STORE_DIR):
+        self.store_dir = store_dir
+
+    def dataset_hash(self, dataset_path):
+        # Hash the raw bytes so any edit to the CSV invalidates the cached model
+        return hash_files([dataset_path])
+
+    def artifact_path(self, dataset_path, dataset_hash):
+        return os.path.join(self.store_dir, f"health_predictor-{dataset_name(dataset_path)}-v{MODEL_FORMAT_VERSION}-"
+                                            f"{dataset_hash[:16]}.pkl")
+
+    def load(self, dataset_path, dataset_hash):
+        # Return the cached artifact, or None if it is missing, stale or unreadable
+        import sklearn
+        path = self.artifact_path(dataset_path, dataset_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as file:
+                artifact = pickle.load(file)
+        except Exception:
+            return None
+        if (artifact.get('format_version') != MODEL_FORMAT_VERSION
+                or artifact.get('dataset_hash') != dataset_hash
+                or artifact.get('sklearn_version') != sklearn.__version__):
+            return None
+        return artifact
+
+    def save(self, dataset_path, dataset_hash, artifact):
+        # Write to a temporary file first so a crash never leaves a half-written model behind
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = self.artifact_path(dataset_path, dataset_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(artifact, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        # Drop artifacts trained on older versions of this dataset, and any from before artifacts were named
+        stale = re.compile(rf"health_predictor-({dataset_name(dataset_path)}-)?v\d+-[0-9a-f]{{16}}\.pkl")
+        for entry in os.listdir(self.store_dir):
+            if stale.fullmatch(entry) and entry != os.path.basename(path):
+                os.remove(os.path.join(self.store_dir, entry))
+        return path
+
+
+# Lookup tables for the categorical answers of a health check
+CATEGORY_MAPS = {
+    'Fever': {'yes': 1, 'no': 0},
+    'Cough': {'yes': 1, 'no': 0},
+    'Fatigue': {'yes': 1, 'no': 0},
+    'Difficulty breathing': {'yes': 1, 'no': 0},
+    'Gender': {'male': 1, 'female': 0},
+    'Blood pressure': {'low': 0, 'normal': 1, 'high': 2},
+    'Cholesterol level': {'low': 0, 'normal': 1, 'high': 2},
+}
+
+
+class FeatureEncoder:
+    # Turns raw intake answers into the feature matrix the model sees, for training and prediction alike
+    def __init__(self, columns, category_maps, age_median, age_mean, age_scale):
+        self.columns = list(columns)
+        self.category_maps = category_maps
+        self.age_median = age_median
+        self.age_mean = age_mean
+        self.age_scale = age_scale
+
+    @classmethod
+    def fit(cls, frame, weights=None):
+        from sklearn.preprocessing import StandardScaler
+
+        # Fill missing ages with the median, then standardise them as StandardScaler would.
+        # weights counts how many rows each row stands for, as in a CompiledDataset
+        ages = pd.to_numeric(frame['Age'], errors='coerce')
+        age_median = float(ages.median()) if weights is None else weighted_median(ages.to_numpy(), weights)
+        scaler = StandardScaler().fit(ages.fillna(age_median).to_frame(), sample_weight=weights)
+        return cls(FEATURE_COLUMNS, CATEGORY_MAPS, age_median, float(scaler.mean_[0]), float(scaler.scale_[0]))
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(**state)
+
+    def to_state(self):
+        # Plain builtins only, so stored artifacts do not depend on where this class lives
+        return {
+            'columns': self.columns,
+            'category_maps': self.category_maps,
+            'age_median': self.age_median,
+            'age_mean': self.age_mean,
+            'age_scale': self.age_scale,
+        }
+
+    def encode_frame(self, frame):
+        # Vectorised: each categorical column is mapped through its unique values only
+        encoded = np.empty((len(frame), len(self.columns)), dtype=np.float64)
+        for position, column in enumerate(self.columns):
+            if column in self.category_maps:
+                mapping = self.category_maps[column]
+                values = frame[column].to_numpy().astype(str)
+                uniques, inverse = np.unique(values, return_inverse=True)
+                # Unknown answers fall back to 0, as the chat health check does
+                codes = np.array([mapping.get(value.strip().lower(), 0) for value in uniques], dtype=np.float64)
+                encoded[:, position] = codes[inverse]
+            else:
+                ages = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+                ages = np.where(np.isnan(ages), self.age_median, ages)
+                encoded[:, position] = (ages - self.age_mean) / self.age_scale
+        return encoded
+
+    def encode_dataset(self, dataset):
+        # Same encoding straight from a CompiledDataset's codes: each dictionary entry is mapped once
+        encoded = np.empty((dataset.rows, len(self.columns)), dtype=np.float64)
+        for position, column in enumerate(self.columns):
+            if column in self.category_maps:
+                mapping = self.category_maps[column]
+                codes = np.array([mapping.get(str(value).strip().lower(), 0) for value in dataset.dictionaries[column]],
+                                 dtype=np.float64)
+                encoded[:, position] = codes[dataset.arrays[column]]
+            else:
+                ages = dataset.arrays[column]
+                ages = np.where(np.isnan(ages), self.age_median, ages)
+                encoded[:, position] = (ages - self.age_mean) / self.age_scale
+        return encoded
+
+    def encode_record(self, record):
+        # Same encoding for a single dict, without building a DataFrame
+        row = []
+        for column in self.columns:
+            value = record.get(column)
+            if column in self.category_maps:
+                row.append(float(self.category_maps[column].get(str(value).strip().lower(), 0)))
+            else:
+                try:
+                    age = float(value)
+                except (TypeError, ValueError):
+                    age = self.age_median
+                if age != age:
+                    age = self.age_median
+                row.append((age - self.age_mean) / self.age_scale)
+        return np.array([row], dtype=np.float64)
+
+
+def weighted_median(values, weights):
+    # The median of values with each repeated weights times (NaN skipped), as pandas would compute it
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights)
+    present = ~np.isnan(values)
+    order = np.argsort(values[present], kind='stable')
+    ordered = values[present][order]
+    if not len(ordered):
+        return float('nan')
+    cumulative = np.cumsum(weights[present][order])
+    middle = np.searchsorted(cumulative, [(cumulative[-1] - 1) // 2, cumulative[-1] // 2], side='right')
+    return float(ordered[middle].mean())
+
+
+# Compiled copies of the training CSV live next to the models, one per CSV version
+DATASET_CACHE_VERSION = 1
+DATASET_CACHE_MAGIC = b'HBDATSET'
+DATASET_CHUNK_ROWS = 500000
+
+
+class CompiledDataset:
+    # The training CSV as dictionary-encoded columns with exact duplicate rows collapsed into weights,
+    # memory-mapped from one file. Advice text is kept once per disease (the first one, as before).
+    #   <column>  codes into header['dictionaries'][column] for every text column (None stands for empty)
+    #   Age       float64, NaN where missing
+    #   weights   how many CSV rows each unique row stands for
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.buffer = buffer
+        self.arrays = arrays
+        self.rows = header['rows']
+        self.samples = header['samples']
+        self.dictionaries = header['dictionaries']
+        self.advice = header['advice']
+        self.weights = arrays['weights']
+
+    @classmethod
+    def compile(cls, csv_path, path, source_hash=None, chunk_rows=DATASET_CHUNK_ROWS):
+        # One pass in chunks: codes for every text column, the age's bits, then unique rows per chunk,
+        # merged at the end, so memory follows the number of distinct rows rather than the file size
+        dictionaries = {}
+        advice = {}
+        uniques, counts = [], []
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            text_columns = [column for column in chunk.columns if column not in ('Age', 'Medical advice')]
+            firsts = chunk.drop_duplicates('Disease')
+            for disease, text in zip(firsts['Disease'], firsts['Medical advice']):
+                advice.setdefault(disease, text)
+
+            keys = np.empty((len(chunk), len(text_columns) + 1), dtype=np.int64)
+            for position, column in enumerate(text_columns):
+                codes, values = pd.factorize(chunk[column], use_na_sentinel=False)
+                dictionary = dictionaries.setdefault(column, {})
+                mapped = np.array([dictionary.setdefault(None if pd.isna(value) else str(value), len(dictionary))
+                                   for value in values], dtype=np.int64)
+                keys[:, position] = mapped[codes]
+            ages = pd.to_numeric(chunk['Age'], errors='coerce').to_numpy(dtype=np.float64)
+            ages[np.isnan(ages)] = np.nan
+            keys[:, -1] = ages.view(np.int64)
+            chunk_uniques, chunk_counts = np.unique(keys, axis=0, return_counts=True)
+            uniques.append(chunk_uniques)
+            counts.append(chunk_counts)
+
+        keys, inverse = np.unique(np.concatenate(uniques), axis=0, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), np.concatenate(counts)).astype(np.int64)
+        arrays = {column: keys[:, position].astype(np.min_scalar_type(max(len(dictionaries[column]) - 1, 0)))
+                  for position, column in enumerate(text_columns)}
+        arrays['Age'] = keys[:, -1].view(np.float64)
+        arrays['weights'] = weights.astype(np.min_scalar_type(int(weights.max(initial=0))))
+        header = {
+            'version': DATASET_CACHE_VERSION,
+            'source_hash': source_hash,
+            'rows': len(keys),
+            'samples': int(weights.sum()),
+            'dictionaries': {column: list(dictionary) for column, dictionary in dictionaries.items()},
+            'advice': advice,
+        }
+        return write_array_file(path, DATASET_CACHE_MAGIC, header, arrays)
+
+    @classmethod
+    def load(cls, path):
+        return cls(*read_array_file(path, DATASET_CACHE_MAGIC, DATASET_CACHE_VERSION, 'compiled dataset'))
+
+    def column(self, column):
+        # Decoded values of one column for the unique rows
+        if column not in self.dictionaries:
+            return np.asarray(self.arrays[column])
+        return np.array(self.dictionaries[column], dtype=object)[self.arrays[column]]
+
+    def labels(self):
+        return self.column('Disease')
+
+    def frame(self):
+        # The unique rows as a DataFrame; weights says how often each appears in the CSV
+        return pd.DataFrame({column: self.column(column) for column in self.arrays if column != 'weights'})
+
+
+def dataset_cache_path(dataset_path, source_hash, store_dir=MODEL_STORE_DIR):
+    return os.path.join(store_dir, f"dataset-{dataset_name(dataset_path)}-v{DATASET_CACHE_VERSION}-"
+                                   f"{source_hash[:16]}.columns")
+
+
+def load_dataset(dataset_path=DATASET_PATH, store_dir=MODEL_STORE_DIR):
+    # The compiled copy of the CSV's current contents, compiled on first use; the CSV's stale copies are removed
+    source_hash = hash_files([dataset_path])
+    path = dataset_cache_path(dataset_path, source_hash, store_dir)
+    try:
+        dataset = CompiledDataset.load(path)
+        if dataset.header['source_hash'] == source_hash:
+            return dataset
+    except (OSError, ValueError):
+        pass
+    os.makedirs(store_dir, exist_ok=True)
+    CompiledDataset.compile(dataset_path, path, source_hash)
+    stale = re.compile(rf"dataset-{dataset_name(dataset_path)}-v\d+-[0-9a-f]{{16}}\.columns")
+    for entry in os.listdir(store_dir):
+        if stale.fullmatch(entry) and entry != os.path.basename(path):
+            os.remove(os.path.join(store_dir, entry))
+    return CompiledDataset.load(path)
+
+
+def check_encoder_parity(encoder, frame):
+    # Encode every row on its own and as one batch; the two must agree bit for bit
+    batch = encoder.encode_frame(frame)
+    for position, record in enumerate(frame.to_dict('records')):
+        single = encoder.encode_record(record)[0]
+        if not np.array_equal(single, batch[position]):
+            return position, single, batch[position]
+    return None
+
+
+class PredictionTable:
+    # Every input is a combination of categorical codes plus an age, so the forest's answer can be
+    # computed once per combination and age bucket and looked up afterwards.
+    # With ages=None the buckets are the intervals between the ages the trees split on; the forest
+    # answers identically for every age inside one, so the table is exact for any age.
+    # With an explicit list of ages only exactly those ages are tabulated; others are not found.
+    def __init__(self, model, encoder, ages=None):
+        self.classes = model.classes_
+        self.categorical = [position for position, column in enumerate(encoder.columns) if column in encoder.category_maps]
+        self.age_position = encoder.columns.index('Age')
+        self.radices = [max(encoder.category_maps[encoder.columns[position]].values()) + 1 for position in self.categorical]
+        self.strides = [int(np.prod(self.radices[index + 1:])) for index in range(len(self.radices))]
+
+        if ages is None:
+            # Thresholds snapped with float32_floor keep every tree test the same and make each
+            # edge the float32 age that represents its bucket
+            thresholds = np.concatenate([tree.tree_.threshold[tree.tree_.feature == self.age_position]
+                                         for tree in model.estimators_] + [np.empty(0)])
+            self.edges = np.unique(float32_floor(thresholds)).astype(np.float64)
+            above = np.nextafter(np.float32(self.edges[-1]), np.float32(np.inf)) if len(self.edges) else 0.0
+            representatives = np.append(self.edges, above)
+            self.edge_list = self.edges.tolist()
+            self.age_slots = None
+        else:
+            self.edges = None
+            representatives = np.unique((np.asarray(ages, dtype=np.float64) - encoder.age_mean) / encoder.age_scale)
+            self.age_slots = {age: slot for slot, age in enumerate(representatives.tolist())}
+        self.representatives = representatives
+
+        # One row per (combination, age slot), in the order lookup() indexes them
+        combinations = np.array(list(itertools.product(*[range(radix) for radix in self.radices])), dtype=np.float64)
+        grid = np.empty((len(combinations) * len(representatives), len(encoder.columns)), dtype=np.float64)
+        grid[:, self.categorical] = np.repeat(combinations, len(representatives), axis=0)
+        grid[:, self.age_position] = np.tile(representatives, len(combinations))
+        probabilities = model.predict_proba(grid)
+        self.best = probabilities.argmax(axis=1).astype(np.int16)
+        self.confidence = probabilities[np.arange(len(grid)), self.best]
+
+    @property
+    def nbytes(self):
+        return self.best.nbytes + self.confidence.nbytes + self.representatives.nbytes + \
+            (self.edges.nbytes if self.edges is not None else 0)
+
+    def slots(self, ages):
+        # Age bucket of each encoded age, or -1 where an explicit age list does not contain it
+        if self.age_slots is None:
+            return np.searchsorted(self.edges, ages.astype(np.float32).astype(np.float64), side='left')
+        return np.array([self.age_slots.get(age, -1) for age in ages.tolist()], dtype=np.intp)
+
+    def lookup(self, features):
+        # Table rows for a batch of encoded features; -1 marks rows the table cannot answer
+        codes = features[:, self.categorical]
+        valid = np.all((codes == np.round(codes)) & (codes >= 0) & (codes < self.radices), axis=1)
+        combination = np.where(valid[:, None], codes, 0).astype(np.intp) @ np.array(self.strides, dtype=np.intp)
+        slot = self.slots(features[:, self.age_position])
+        return np.where(valid & (slot >= 0), combination * len(self.representatives) + slot, -1)
+
+    def lookup_row(self, row):
+        # Single-record version of lookup() in plain Python, for the chat's one-at-a-time predictions
+        combination = 0
+        for position, radix, stride in zip(self.categorical, self.radices, self.strides):
+            code = row[position]
+            if code != int(code) or not 0 <= code < radix:
+                return -1
+            combination += int(code) * stride
+        age = row[self.age_position]
+        if self.age_slots is None:
+            slot = bisect.bisect_left(self.edge_list, float(np.float32(age)))
+        else:
+            slot = self.age_slots.get(age, -1)
+            if slot < 0:
+                return -1
+        return combination * len(self.representatives) + slot
+
+
+class HealthPredictor:
+    # table_ages configures the PredictionTable buckets; compiled=False always runs the forest.
+    # Inputs the table cannot answer go to the forest through an LRU cache of cache_size records
+    def __init__(self, dataset_path, model_store=None, compiled=True, table_ages=None, cache_size=4096, artifact=None):
+        self.dataset_path = dataset_path
+        self.model_store = model_store or ModelStore()
+        self.compiled = compiled
+        self.table_ages = table_ages
+        self.live_prediction = functools.lru_cache(maxsize=cache_size)(self.predict_row)
+        if artifact is not None:
+            self.load_artifact(artifact)
+            return
+
+        # Reuse the stored model when the dataset has not changed, otherwise train and store a new one
+        dataset_hash = self.model_store.dataset_hash(dataset_path)
+        artifact = self.model_store.load(dataset_path, dataset_hash)
+        if artifact is None:
+            artifact = self.train()
+            artifact['dataset_hash'] = dataset_hash
+            self.model_store.save(dataset_path, dataset_hash, artifact)
+        self.load_artifact(artifact)
+
+    def train(self):
+        # The default recipe, scored on the held-out split; python HealthBuddy.py train publishes a tuned model
+        return ModelTrainer(self.dataset_path).run(search=False)
+
+    def load_artifact(self, artifact):
+        self.artifact = artifact
+        self.dataset_hash = artifact.get('dataset_hash')
+        self.model = artifact['model']
+        self.encoder = FeatureEncoder.from_state(artifact['encoder'])
+        self.advice = artifact['advice']
+
+        # Advice aligned with model.classes_ so a whole batch can be looked up with one take()
+        self.class_advice = np.array([self.advice[disease] for disease in self.model.classes_], dtype=object)
+
+        self.table = PredictionTable(self.model, self.encoder, self.table_ages) if self.compiled else None
+        self.live_prediction.cache_clear()
+
+    def predict_row(self, row):
+        # One encoded record through the forest; returns (class index, probability)
+        probabilities = self.model.predict_proba(np.array([row], dtype=np.float64))[0]
+        best = probabilities.argmax()
+        return best, probabilities[best]
+
+    def classify(self, features):
+        # Class index and probability for each encoded row, from the table where it can answer
+        if self.table is None:
+            probabilities = self.model.predict_proba(features)
+            best = probabilities.argmax(axis=1)
+            return best, probabilities[np.arange(len(best)), best]
+        index = self.table.lookup(features)
+        found = index >= 0
+        best = np.empty(len(features), dtype=np.intp)
+        confidence = np.empty(len(features), dtype=np.float64)
+        best[found] = self.table.best[index[found]]
+        confidence[found] = self.table.confidence[index[found]]
+        if not found.all():
+            probabilities = self.model.predict_proba(features[~found])
+            missing_best = probabilities.argmax(axis=1)
+            best[~found] = missing_best
+            confidence[~found] = probabilities[np.arange(len(missing_best)), missing_best]
+        return best, confidence
+
+    def predict_disease(self, patient_data):
+        # patient_data holds the raw answers keyed like the dataset columns ('Fever': 'yes', 'Age': 30, ...)
+        row = tuple(self.encoder.encode_record(patient_data)[0].tolist())
+
+        # Predict the disease: a table lookup, or the forest for inputs the table does not cover
+        index = self.table.lookup_row(row) if self.table is not None else -1
+        best = self.table.best[index] if index >= 0 else self.live_prediction(row)[0]
+        predicted_disease = self.model.classes_[best]
+
+        # Get medical advice corresponding to the predicted disease
+        advice = self.advice[predicted_disease]
+
+        return predicted_disease, advice
+
+    def iter_chunks(self, records, chunk_size):
+        # Yields (index, features); DataFrames and record iterators hold raw intake fields, NumPy arrays are already encoded
+        if isinstance(records, pd.DataFrame):
+            for start in range(0, len(records), chunk_size):
+                chunk = records.iloc[start:start + chunk_size]
+                yield chunk.index, self.encoder.encode_frame(chunk)
+        elif isinstance(records, np.ndarray):
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                yield pd.RangeIndex(start, start + len(chunk)), chunk
+        else:
+            records = iter(records)
+            start = 0
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                yield pd.RangeIndex(start, start + len(chunk)), self.encoder.encode_frame(pd.DataFrame(chunk))
+                start += len(chunk)
+
+    def iter_predictions(self, records, chunk_size=10000):
+        # Score one chunk at a time so memory stays bounded for any input size
+        for index, features in self.iter_chunks(records, chunk_size):
+            best, confidence = self.classify(features)
+            yield pd.DataFrame({
+                'Predicted Disease': self.model.classes_.take(best),
+                'Confidence': confidence,
+                'Medical Advice': self.class_advice.take(best),
+            }, index=index)
+
+    def predict_many(self, records, chunk_size=10000):
+        results = list(self.iter_predictions(records, chunk_size))
+        if not results:
+            return pd.DataFrame(columns=['Predicted Disease', 'Confidence', 'Medical Advice'])
+        return pd.concat(results)
+
+# The recipe HealthPredictor.train uses when no tuned model has been published
+DEFAULT_FOREST_PARAMS = {'n_estimators': 100, 'max_depth': None, 'class_weight': None}
+
+# Hyperparameters tried by the train command; n_estimators is a cap when early stopping is on
+FOREST_SEARCH_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 8, 16],
+    'class_weight': [None, 'balanced', 'balanced_subsample'],
+}
+
+
+def fit_forest(X, y, params, early_stopping=False, tree_step=25, patience=2, tolerance=1e-3, random_state=42,
+               sample_weight=None):
+    # Fits a forest; with early stopping it grows tree_step trees at a time up to params['n_estimators']
+    # and stops once the out-of-bag accuracy has not improved by tolerance for patience steps.
+    # sample_weight counts the CSV rows each unique row stands for
+    import warnings
+    from sklearn.ensemble import RandomForestClassifier
+
+    if params['class_weight'] == 'balanced' and sample_weight is not None:
+        # 'balanced' must count the duplicates a row stands for, not the unique rows
+        classes, slots = np.unique(y, return_inverse=True)
+        totals = np.bincount(slots.ravel(), sample_weight)
+        params = dict(params, class_weight=dict(zip(classes, totals.sum() / (len(classes) * totals))))
+
+    with warnings.catch_warnings():
+        # Many diseases have a single example, which sklearn mistakes for a regression target.
+        # Small forests also leave some rows without out-of-bag votes
+        warnings.filterwarnings('ignore', message='The number of unique classes', category=UserWarning)
+        warnings.filterwarnings('ignore', message='Some inputs do not have OOB scores', category=UserWarning)
+        if not early_stopping:
+            model = RandomForestClassifier(random_state=random_state, **params)
+            model.fit(X, y, sample_weight=sample_weight)
+            return model
+
+        # Warm starts refit on the same rows, so 'balanced' can be fixed up front; 'balanced_subsample'
+        # is computed per bootstrap either way
+        tree_cap = params['n_estimators']
+        params = dict(params, n_estimators=min(tree_step, tree_cap))
+        if params['class_weight'] == 'balanced':
+            from sklearn.utils.class_weight import compute_class_weight
+            classes = np.unique(y)
+            params['class_weight'] = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y)))
+        warnings.filterwarnings('ignore', message='class_weight presets', category=UserWarning)
+        model = RandomForestClassifier(random_state=random_state, warm_start=True, oob_score=True, **params)
+        best_score, stale = -1.0, 0
+        while True:
+            model.fit(X, y, sample_weight=sample_weight)
+            if model.oob_score_ > best_score + tolerance:
+                best_score, stale = model.oob_score_, 0
+            else:
+                stale += 1
+            if stale >= patience or model.n_estimators >= tree_cap:
+                break
+            model.n_estimators = min(model.n_estimators + tree_step, tree_cap)
+    return model
+
+
+# Training data for cross-validation workers, set once per process by set_training_data
+TRAINING_DATA = {}
+
+
+def set_training_data(X, y, weights, early_stopping, tree_step):
+    TRAINING_DATA.update(X=X, y=y, weights=weights, early_stopping=early_stopping, tree_step=tree_step)
+
+
+def cross_validation_fold(candidate, params, train_index, test_index):
+    # One (hyperparameters, fold) cell of the search, run in a worker process
+    X, y, weights = TRAINING_DATA['X'], TRAINING_DATA['y'], TRAINING_DATA['weights']
+    started = time.perf_counter()
+    model = fit_forest(X[train_index], y[train_index], params, TRAINING_DATA['early_stopping'], TRAINING_DATA['tree_step'],
+                       sample_weight=weights[train_index])
+    fit_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    predicted = model.predict(X[test_index])
+    predict_elapsed = time.perf_counter() - started
+    return {
+        'candidate': candidate,
+        'accuracy': float(np.average(predicted == y[test_index], weights=weights[test_index])),
+        'fit_seconds': fit_elapsed,
+        'predict_seconds': predict_elapsed,
+        'predict_rows': len(test_index),
+        'trees': len(model.estimators_),
+    }
+
+
+class ModelTrainer:
+    # k-fold cross-validated hyperparameter search on a process pool. The winner is refitted on the
+    # whole training split, scored on a held-out split the search never saw, and returned as an artifact.
+    # sample_size bounds the rows used for the search and the refit so large datasets stay quick.
+    def __init__(self, dataset_path, folds=5, grid=FOREST_SEARCH_GRID, workers=None, sample_size=None,
+                 early_stopping=False, tree_step=25, random_state=42, record_store=None):
+        self.dataset_path = dataset_path
+        # Confirmed outcomes in this store's training log are trained on alongside the CSV
+        self.record_store = record_store
+        self.folds = folds
+        self.grid = grid
+        self.workers = workers or os.cpu_count()
+        self.sample_size = sample_size
+        self.early_stopping = early_stopping
+        self.tree_step = tree_step
+        self.random_state = random_state
+
+    def load(self):
+        # The CSV comes from its compiled cache: one row per distinct row, weighted by how often it occurs
+        dataset = load_dataset(self.dataset_path)
+        advice = dict(dataset.advice)
+        ages = [dataset.arrays['Age']]
+        weights = [dataset.weights.astype(np.float64)]
+        log_position, outcomes = 0, None
+        if self.record_store is not None:
+            log_position, outcomes = self.record_store.training_log()
+            ages.append(pd.to_numeric(outcomes['Age'], errors='coerce').to_numpy(dtype=np.float64))
+            weights.append(np.ones(len(outcomes)))
+            for disease in outcomes['Disease'].unique():
+                advice.setdefault(disease, "Please follow the advice of the doctor who confirmed this diagnosis.")
+        w = np.concatenate(weights)
+        encoder = FeatureEncoder.fit(pd.DataFrame({'Age': np.concatenate(ages)}), w)
+        # 'Outcome variable' is not a feature, so the encoder never reads it
+        X = encoder.encode_dataset(dataset)
+        y = dataset.labels()
+        if outcomes is not None and len(outcomes):
+            X = np.vstack([X, encoder.encode_frame(outcomes)])
+            y = np.concatenate([y, outcomes['Disease'].to_numpy(dtype=object)])
+        return X, y, w, encoder, advice, log_position
+
+    def sample(self, X, y, w, size, seed_offset=0):
+        # Samples unique rows with probability proportional to how many CSV rows they stand for
+        if not size or len(X) <= size:
+            return X, y, w
+        rows = np.random.default_rng(self.random_state + seed_offset).choice(len(X), size, replace=False, p=w / w.sum())
+        rows.sort()
+        return X[rows], y[rows], np.ones(size)
+
+    def search(self, X, y, w):
+        from sklearn.model_selection import KFold, ParameterGrid
+
+        candidates = list(ParameterGrid(self.grid))
+        splits = list(KFold(self.folds, shuffle=True, random_state=self.random_state).split(X))
+        with concurrent.futures.ProcessPoolExecutor(
+                self.workers, initializer=set_training_data,
+                initargs=(X, y, w, self.early_stopping, self.tree_step)) as executor:
+            futures = [executor.submit(cross_validation_fold, candidate, params, train_index, test_index)
+                       for candidate, params in enumerate(candidates)
+                       for train_index, test_index in splits]
+            folds = [future.result() for future in futures]
+
+        results = []
+        for candidate, params in enumerate(candidates):
+            scores = [fold for fold in folds if fold['candidate'] == candidate]
+            accuracies = [fold['accuracy'] for fold in scores]
+            results.append({
+                'params': params,
+                'mean_accuracy': statistics.mean(accuracies),
+                'std_accuracy': statistics.pstdev(accuracies),
+                'fit_seconds': statistics.mean(fold['fit_seconds'] for fold in scores),
+                'predict_us_per_row': sum(fold['predict_seconds'] for fold in scores) * 1e6
+                                      / sum(fold['predict_rows'] for fold in scores),
+                'trees': statistics.mean(fold['trees'] for fold in scores),
+            })
+        # Most accurate first; among equals the cheaper forest wins
+        results.sort(key=lambda result: (-round(result['mean_accuracy'], 6), result['trees'], result['fit_seconds']))
+        return results
+
+    def run(self, search=True, params=None):
+        import sklearn
+        from sklearn.metrics import precision_recall_fscore_support
+        from sklearn.model_selection import train_test_split
+
+        X, y, w, encoder, advice, log_position = self.load()
+        X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+            X, y, w, test_size=0.2, random_state=self.random_state)
+        X_train, y_train, w_train = self.sample(X_train, y_train, w_train, self.sample_size)
+        X_test, y_test, w_test = self.sample(X_test, y_test, w_test, self.sample_size, seed_offset=1)
+
+        started = time.perf_counter()
+        results = self.search(X_train, y_train, w_train) if search else []
+        search_elapsed = time.perf_counter() - started
+        params = results[0]['params'] if results else params or DEFAULT_FOREST_PARAMS
+
+        started = time.perf_counter()
+        model = fit_forest(X_train, y_train, params, self.early_stopping, self.tree_step, random_state=self.random_state,
+                           sample_weight=w_train)
+        fit_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        predicted = model.predict(X_test)
+        predict_elapsed = time.perf_counter() - started
+
+        labels = np.unique(np.concatenate([y_test, predicted]))
+        precision, recall, f1, support = precision_recall_fscore_support(
+            y_test, predicted, labels=labels, sample_weight=w_test, zero_division=0)
+        report = {
+            'params': params,
+            'trees': len(model.estimators_),
+            'train_rows': len(X_train),
+            'test_rows': len(X_test),
+            'train_samples': int(w_train.sum()),
+            'test_samples': int(w_test.sum()),
+            'folds': self.folds if search else 0,
+            'workers': self.workers,
+            'search_seconds': search_elapsed,
+            'search': results,
+            'fit_seconds': fit_elapsed,
+            'predict_us_per_row': predict_elapsed * 1e6 / max(len(X_test), 1),
+            'holdout_accuracy': float(np.average(predicted == y_test, weights=w_test)) if len(y_test) else 0.0,
+            'per_class': {str(label): {'precision': float(p), 'recall': float(r), 'f1': float(f), 'support': int(s)}
+                          for label, p, r, f, s in zip(labels, precision, recall, f1, support)},
+        }
+
+        # Everything needed to predict without touching the CSV again
+        return {
+            'format_version': MODEL_FORMAT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            # Unique per trained or updated model, so anything derived from its predictions can tell it changed
+            'model_id': uuid.uuid4().hex,
+            'model': model,
+            'encoder': encoder.to_state(),
+            'advice': advice,
+            'training': report,
+            # Incremental updates continue from this training log row and mix in the replay rows
+            'training_log_position': log_position,
+            'replay': replay_rows(X_train, y_train),
+            # Trees fitted on the whole dataset; incremental updates never retire these
+            'base_trees': len(model.estimators_),
+        }
+
+
+# Incremental learning: confirmed outcomes per background update, trees added per update,
+# forest size beyond which the oldest incremental trees are retired, and training rows kept per disease
+INCREMENTAL_BATCH = 50
+INCREMENTAL_TREES = 10
+INCREMENTAL_MAX_TREES = 300
+INCREMENTAL_REPLAY = 20
+
+
+def replay_rows(X, y, per_class=INCREMENTAL_REPLAY):
+    # The last per_class rows of every class, in their original order
+    newest_first = pd.Series(y[::-1]).groupby(y[::-1]).cumcount().to_numpy() < per_class
+    keep = newest_first[::-1]
+    return X[keep], y[keep]
+
+
+class ModelUpdater:
+    # Folds confirmed outcomes from the training log into the forest without a full refit: every update
+    # grows a few warm-started trees on the new rows plus a small replay set holding every known disease.
+    # Outcomes for diseases the forest has never seen cannot be added that way; once batch_size of them
+    # have piled up the model is retrained from the CSV and the whole log instead. Past max_trees the
+    # oldest incremental trees are retired; the trees of the last full training always stay.
+    def __init__(self, record_store, dataset_path=DATASET_PATH, model_store=None, batch_size=INCREMENTAL_BATCH,
+                 trees_per_update=INCREMENTAL_TREES, max_trees=INCREMENTAL_MAX_TREES):
+        self.record_store = record_store
+        self.dataset_path = dataset_path
+        self.model_store = model_store or ModelStore()
+        self.batch_size = batch_size
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+
+    def pending(self, predictor):
+        return self.record_store.outcome_count(predictor.artifact.get('training_log_position', 0))
+
+    def update(self, predictor, force=False):
+        # Returns a new predictor with the outcomes folded in, or None when there is not enough new data.
+        # The current predictor is left untouched, so it can keep answering until the caller swaps
+        artifact = predictor.artifact
+        last_id, outcomes = self.record_store.training_log(artifact.get('training_log_position', 0))
+        if outcomes.empty or (len(outcomes) < self.batch_size and not force):
+            return None
+
+        model = artifact['model']
+        known = outcomes['Disease'].isin(set(model.classes_)).to_numpy()
+        unseen = artifact.get('unseen_outcomes', 0) + int((~known).sum())
+        if 'replay' not in artifact or unseen >= self.batch_size:
+            trainer = ModelTrainer(self.dataset_path, record_store=self.record_store)
+            updated = trainer.run(search=False, params=artifact.get('training', {}).get('params'))
+            updated['updates'] = 0
+        else:
+            encoder = FeatureEncoder.from_state(artifact['encoder'])
+            replay_X, replay_y = artifact['replay']
+            X = np.vstack([replay_X, encoder.encode_frame(outcomes[known])])
+            y = np.concatenate([replay_y, outcomes['Disease'].to_numpy()[known]])
+            # Models saved before base_trees was recorded had trees_per_update trees added per update
+            base_trees = artifact.get('base_trees',
+                                      max(len(model.estimators_) - artifact.get('updates', 0) * self.trees_per_update, 0))
+            updated = dict(artifact, model=self.grow(model, X, y, base_trees), model_id=uuid.uuid4().hex,
+                           replay=replay_rows(X, y), base_trees=base_trees,
+                           training_log_position=last_id, unseen_outcomes=unseen,
+                           updates=artifact.get('updates', 0) + 1)
+        updated['dataset_hash'] = artifact.get('dataset_hash')
+        self.model_store.save(self.dataset_path, updated['dataset_hash'], updated)
+        return HealthPredictor(self.dataset_path, self.model_store, predictor.compiled, predictor.table_ages,
+                               artifact=updated)
+
+    def grow(self, model, X, y, base_trees=0):
+        import warnings
+
+        # A shallow copy shares the fitted trees, so the live model never sees a half-grown forest
+        grown = copy.copy(model)
+        grown.estimators_ = list(model.estimators_)
+        grown.warm_start = True
+        grown.oob_score = False
+        grown.n_estimators = len(grown.estimators_) + self.trees_per_update
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='The number of unique classes', category=UserWarning)
+            warnings.filterwarnings('ignore', message='class_weight presets', category=UserWarning)
+            grown.fit(X, y)
+        if not np.array_equal(grown.classes_, model.classes_):
+            raise ValueError("Incremental update changed the set of diseases")
+        # Retire the oldest incremental trees only: the first base_trees were fitted on the whole dataset
+        # and keep the forest anchored to it however many updates follow
+        incremental = len(grown.estimators_) - base_trees
+        allowed = max(self.max_trees - base_trees, self.trees_per_update)
+        if incremental > allowed:
+            grown.estimators_ = grown.estimators_[:base_trees] + grown.estimators_[-allowed:]
+            grown.n_estimators = len(grown.estimators_)
+        return grown
+
+
+def print_training_report(report, top=5):
+    if report['search']:
+        print(f"{len(report['search'])} candidates x {report['folds']} folds on {report['train_rows']} distinct rows "
+              f"with {report['workers']} workers in {report['search_seconds']:.1f}s")
+        for result in report['search'][:top]:
+            print(f"  accuracy {result['mean_accuracy']:.3f} +/- {result['std_accuracy']:.3f}   {result['trees']:5.0f} trees   "
+                  f"fit {result['fit_seconds']:6.2f}s   predict {result['predict_us_per_row']:6.1f} us/row   {json.dumps(result['params'])}")
+    print(f"chosen {json.dumps(report['params'])}, {report['trees']} trees: fit {report['fit_seconds']:.2f}s, "
+          f"predict {report['predict_us_per_row']:.1f} us/row")
+    print(f"held-out accuracy {report['holdout_accuracy']:.3f} on {report['test_rows']} distinct rows "
+          f"standing for {report['test_samples']} samples")
+    classes = sorted(report['per_class'].items(), key=lambda item: -item[1]['support'])
+    print(f"  {'disease':32s} precision  recall      f1  support")
+    for label, metrics in classes[:top * 2]:
+        print(f"  {label[:32]:32s} {metrics['precision']:9.2f} {metrics['recall']:7.2f} {metrics['f1']:7.2f} {metrics['support']:8d}")
+    if len(classes) > top * 2:
+        print(f"  ... {len(classes) - top * 2} more classes")
+
+
+def float32_floor(values):
+    # Largest float32 not above each value. Trees compare float32 features with float64 thresholds,
+    # and float32(x) <= t exactly when float32(x) <= float32_floor(t)
+    values = np.asarray(values, dtype=np.float64)
+    snapped = values.astype(np.float32)
+    return np.where(snapped > values, np.nextafter(snapped, np.float32(-np.inf)), snapped)
+
+
+def write_array_file(path, magic, header, arrays):
+    # Magic, header length, JSON header, then each array aligned to 64 bytes; header['arrays'] records the layout
+    header['arrays'] = {}
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // 64) * 64
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(magic) + 8 + len(header_bytes)) // 64) * 64
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(magic)
+        file.write(len(header_bytes).to_bytes(8, 'little'))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.seek(data_start + header['arrays'][name]['offset'])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_array_file(path, magic, version, kind):
+    # Returns (header, arrays, buffer); the arrays are read-only views into a memory mapping of the file
+    import mmap
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic_end = len(magic)
+    if buffer[:magic_end] != magic:
+        raise ValueError(f"{path} is not a {kind} file")
+    header_length = int.from_bytes(buffer[magic_end:magic_end + 8], 'little')
+    header = json.loads(buffer[magic_end + 8:magic_end + 8 + header_length])
+    if header.get('version') != version:
+        raise ValueError(f"{path} has {kind} version {header.get('version')}, expected {version}")
+    data_start = -(-(magic_end + 8 + header_length) // 64) * 64
+
+    # Pages are loaded by the OS as the arrays are touched
+    arrays = {}
+    for name, layout in header['arrays'].items():
+        dtype = np.dtype(layout['dtype'])
+        count = int(np.prod(layout['shape']))
+        arrays[name] = np.frombuffer(buffer, dtype, count, data_start + layout['offset']).reshape(layout['shape'])
+    return header, arrays, buffer
+
+
+# Layout version of exported compact forests
+COMPACT_FOREST_VERSION = 1
+COMPACT_FOREST_MAGIC = b'HBFOREST'
+COMPACT_FOREST_PATH = 'health_predictor.forest'
+
+
+class CompactForest:
+    # The random forest flattened into a few contiguous arrays, read straight from a memory-mapped file.
+    # Prediction needs NumPy only and matches RandomForestClassifier.predict_proba bit for bit.
+    #   feature[node]    int8, -1 for leaves
+    #   threshold[node]  float32, snapped with float32_floor
+    #   left/right[node] int32 absolute node ids; for a leaf, left holds its row in the leaf arrays
+    #   leaf_offsets[leaf] .. leaf_offsets[leaf + 1] index the leaf's non-zero class probabilities,
+    #   stored in leaf_classes (uint8/int16) and leaf_values (float64)
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.buffer = buffer
+        self.classes = header['classes']
+        self.class_advice = header['advice']
+        # Advice by disease name, as HealthPredictor.advice
+        self.advice = dict(zip(self.classes, self.class_advice))
+        self.encoder = FeatureEncoder.from_state(header['encoder'])
+        self.max_depth = header['max_depth']
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    @classmethod
+    def export(cls, predictor, path=COMPACT_FOREST_PATH):
+        model = predictor.model
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        node_starts = np.cumsum([0] + [tree.node_count for tree in trees])
+        leaf_starts = np.cumsum([0] + [tree.n_leaves for tree in trees])
+
+        feature, threshold, left, right = [], [], [], []
+        leaf_counts, leaf_classes, leaf_values = [], [], []
+        for tree, node_start, leaf_start in zip(trees, node_starts, leaf_starts):
+            is_leaf = tree.feature < 0
+            leaf_ids = np.cumsum(is_leaf) - 1 + leaf_start
+            feature.append(np.where(is_leaf, -1, tree.feature))
+            threshold.append(np.where(is_leaf, 0.0, float32_floor(tree.threshold)))
+            left.append(np.where(is_leaf, leaf_ids, tree.children_left + node_start))
+            right.append(np.where(is_leaf, -1, tree.children_right + node_start))
+            # DecisionTreeClassifier.predict_proba returns these rows as they are
+            probabilities = tree.value[is_leaf, 0, :model.n_classes_]
+            leaf_counts.append(np.count_nonzero(probabilities, axis=1))
+            rows, columns = np.nonzero(probabilities)
+            leaf_classes.append(columns)
+            leaf_values.append(probabilities[rows, columns])
+
+        class_dtype = np.uint8 if model.n_classes_ <= 256 else np.int16
+        arrays = {
+            'feature': np.concatenate(feature).astype(np.int8),
+            'threshold': np.concatenate(threshold).astype(np.float32),
+            'left': np.concatenate(left).astype(np.int32),
+            'right': np.concatenate(right).astype(np.int32),
+            'roots': node_starts[:-1].astype(np.int32),
+            'leaf_offsets': np.concatenate([[0], np.cumsum(np.concatenate(leaf_counts))]).astype(np.int32),
+            'leaf_classes': np.concatenate(leaf_classes).astype(class_dtype),
+            'leaf_values': np.concatenate(leaf_values).astype(np.float64),
+        }
+        header = {
+            'version': COMPACT_FOREST_VERSION,
+            'classes': [str(disease) for disease in model.classes_],
+            'advice': [predictor.advice[disease] for disease in model.classes_],
+            'encoder': predictor.encoder.to_state(),
+            'max_depth': max(tree.max_depth for tree in trees),
+            'dataset_hash': predictor.dataset_hash,
+        }
+        return write_array_file(path, COMPACT_FOREST_MAGIC, header, arrays)
+
+    @classmethod
+    def load(cls, path=COMPACT_FOREST_PATH):
+        return cls(*read_array_file(path, COMPACT_FOREST_MAGIC, COMPACT_FOREST_VERSION, 'compact forest'))
+
+    def leaves(self, features):
+        # Walk every tree for every row at once, dropping paths as they reach a leaf; returns leaf ids shaped (trees, rows)
+        values = np.asarray(features, dtype=np.float64).astype(np.float32)
+        width = values.shape[1]
+        values = values.ravel()
+        nodes = np.repeat(self.roots, len(features))
+        offsets = np.tile(np.arange(len(features)) * width, len(self.roots))
+        active = np.arange(len(nodes))
+        while len(active):
+            current = nodes[active]
+            feature = self.feature[current]
+            internal = feature >= 0
+            active, current, feature = active[internal], current[internal], feature[internal]
+            go_right = values[offsets[active] + feature] > self.threshold[current]
+            nodes[active] = np.where(go_right, self.right[current], self.left[current])
+        return self.left[nodes].reshape(len(self.roots), len(features))
+
+    def predict_proba(self, features):
+        leaves = self.leaves(features)
+        row_count, class_count = leaves.shape[1], len(self.classes)
+
+        # Expand each leaf's non-zero entries tree by tree; bincount adds them in that order,
+        # as the forest sums its trees' probabilities before dividing by their number
+        starts = self.leaf_offsets[leaves].ravel()
+        counts = self.leaf_offsets[leaves + 1].ravel() - starts
+        entries = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        rows = np.repeat(np.tile(np.arange(row_count), leaves.shape[0]), counts)
+        cells = rows * class_count + self.leaf_classes[entries]
+        probabilities = np.bincount(cells, self.leaf_values[entries], row_count * class_count)
+        probabilities = probabilities.reshape(row_count, class_count)
+        probabilities /= len(self.roots)
+        return probabilities
+
+    def classify(self, features, chunk_size=4096):
+        # Class index and probability per row; chunked because traversal state grows with rows x trees
+        features = np.asarray(features, dtype=np.float64)
+        best = np.empty(len(features), dtype=np.intp)
+        confidence = np.empty(len(features), dtype=np.float64)
+        for start in range(0, len(features), chunk_size):
+            probabilities = self.predict_proba(features[start:start + chunk_size])
+            chunk_best = probabilities.argmax(axis=1)
+            best[start:start + chunk_size] = chunk_best
+            confidence[start:start + chunk_size] = probabilities[np.arange(len(chunk_best)), chunk_best]
+        return best, confidence
+
+    def predict_disease(self, patient_data):
+        # Same contract as HealthPredictor.predict_disease
+        best = self.predict_proba(self.encoder.encode_record(patient_data))[0].argmax()
+        return self.classes[best], self.class_advice[best]
+
+
+def load_predictor(compact_model=None):
+    # Kiosks that ship an exported forest run on NumPy alone; everywhere else the scikit-learn model is used
+    if compact_model:
+        return CompactForest.load(compact_model)
+    return HealthPredictor(DATASET_PATH)
+
+
+# Define patterns and responses for the rule-based chatbot (tried in order, first match wins)
+pairs = [
+    [r"my name is (.*)", ["Hello %1, how can I assist you today? you can type 'login' if you need a Health Assistant 🧑‍⚕️.."]],
+    [r"hi|hey|hello", ["Hello, how can I help you? you can type 'login' if you need a Health Assistant 🧑‍⚕️..", "Hey there! What can I do for you? you can type 'login' if you need a Health Assistant 🧑‍⚕️..", "Hi! How can I assist you today? you can type 'login' if you need a Health Assistant 🧑‍⚕️.."]],
+    [r"i need help|help", ["I'm here to take care of you 😊. What's the problem?🤔🩺", "What happened 😨, what can i do for you?"]],
+    [r"i have fever|i think im having a fever|i got fever|fever", ["For common fever, 🛌 rest, stay hydrated with fluids 🥤, use over-the-counter medications like paracetamol or ibuprofen 💊 to reduce fever, and apply a cool compress ❄ or take a lukewarm bath 🛁 to lower body temperature. Consult a healthcare professional if symptoms persist or worsen"]],
+    [r"i have cough|im having a cough|i got cough|cough", ["For common cough, 🥤 stay hydrated, use a humidifier or inhale steam 🌫 to soothe the throat, try over-the-counter cough syrups or lozenges 💊, and rest well 🛌. If the cough persists for more than a week or is accompanied by other symptoms, consult a healthcare professional"]],
+    [r"what is your name?|what are you|who are you|whats your name", ["I am a chatbot created to assist you 🤖. You can call me Health Buddy 🩺😊","I am a chatbot 🤖. My developers call me Health Buddy 🩺😊", "I am an AI Health Assistant, You can call me Health Buddy 🩺😊"]],
+    [r"how are you?", ["I'm good enough to assist you and help you with your health 😊🩺"]],
+    [r"can you help me with (.*)", ["Sure, I can help you with %1. Please provide more details."]],
+    [r"sorry (.*)", ["It's okay. How can I assist you?"]],
+    [r"sorry", ["It's okay. How can I assist you?"]],
+    [r"health report|view health report|show health report|update health report|update health check|update report", ["You need to login first to get those information, please type 'login'","To access those information, please type 'login'","First login to get those information, please type 'login'"]],
+    [r"thank you|thanks", ["You're welcome!😊", "No problem!😊", "Happy to help!😊"]],
+    [r"login", ["Ok, Please enter your name...", "Got it, Please enter your name..."]],
+    [r"bye|quit|see you later|goodbye", ["Bye! Have a great day!😊", "Goodbye!😊"]],
+    [r"i do not understand|i do not understood|i didnt understand|i didnt understood|i did not understand", ["I am sorry for the Inconvenience, My skill-set is still under development. But you can explore other features, just type 'login' to access Health Assistants"]],
+    [r"(.*)", ["I'm sorry, I don't understand that. Can you rephrase?", "Could you please elaborate on that?"]]
+]
+
+
+# First/second person swaps applied to captured text, the same table nltk.chat.util uses
+reflections = {
+    "i am": "you are",
+    "i was": "you were",
+    "i": "you",
+    "i'm": "you are",
+    "i'd": "you would",
+    "i've": "you have",
+    "i'll": "you will",
+    "my": "your",
+    "you are": "I am",
+    "you were": "I was",
+    "you've": "I have",
+    "you'll": "I will",
+    "your": "my",
+    "yours": "mine",
+    "you": "me",
+    "me": "you",
+}
+
+# Commands recognised after login, in the priority order get_bot_response applies them
+command_keywords = [
+    ("view_health_report", "view health report"),
+    ("view_health_history", "health history"),
+    ("health_check", "health check"),
+    ("update_health_check", "update health check"),
+    ("daily_medical_advice", "daily medical advice"),
+    ("symptom_advice", "symptom advice"),
+    ("confirm_diagnosis", "confirm diagnosis"),
+    ("medicine_reminder", "medicine reminder"),
+    ("doctor_appointment", "doctor appointment"),
+    ("exit", "exit"),
+    ("exit", "close"),
+]
+
+
+class Intent:
+    def __init__(self, pattern_index, response, captures, command, login):
+        self.pattern_index = pattern_index  # index into pairs, or None
+        self.response = response            # chat reply with captures filled in
+        self.captures = captures
+        self.command = command              # highest-priority command keyword found, or None
+        self.login = login                  # 'login' appears anywhere in the message
+
+
+def split_alternatives(pattern):
+    # Split a regex on its top-level '|' only, skipping escapes, groups and character classes
+    branches = []
+    depth = 0
+    start = 0
+    position = 0
+    in_class = False
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '\\':
+            position += 1
+        elif in_class:
+            if char == ']':
+                in_class = False
+        elif char == '[':
+            in_class = True
+            # A ']' straight after '[' or '[^' is a literal, not the end of the class
+            if pattern[position + 1:position + 2] == '^':
+                position += 1
+            if pattern[position + 1:position + 2] == ']':
+                position += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            branches.append(pattern[start:position])
+            start = position + 1
+        position += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def literal_prefix(branch):
+    # Lower-cased plain-text start of a regex branch; '' means it could start with anything
+    prefix = []
+    for char in branch:
+        if char in '*?{':
+            # The character before an optional quantifier may be absent
+            if prefix:
+                prefix.pop()
+            break
+        if char in '.^$+[]\\|()' or not char.isascii():
+            break
+        prefix.append(char.lower())
+    return ''.join(prefix)
+
+
+class PrefixNode:
+    def __init__(self, candidates):
+        self.children = {}
+        # Indices of every pattern that can match a message reaching this node, in table order
+        self.candidates = candidates
+
+
+class IntentMatcher:
+    def __init__(self, pairs, command_keywords, reflections):
+        self.pairs = pairs
+        self.compiled = {}
+
+        # A pattern can only match messages starting with one of its branches' literal prefixes.
+        # Index those prefixes in a character trie; patterns without a prefix sit at the root.
+        prefixes = [{literal_prefix(branch) for branch in split_alternatives(pattern)} for pattern, _ in pairs]
+        wildcards = tuple(index for index, options in enumerate(prefixes) if '' in options)
+        self.all_candidates = tuple(range(len(pairs)))
+        self.root = PrefixNode(wildcards)
+        for index, options in enumerate(prefixes):
+            if '' in options:
+                continue
+            for prefix in options:
+                node = self.root
+                for char in prefix:
+                    node = node.children.setdefault(char, PrefixNode(None))
+                node.candidates = (node.candidates or ()) + (index,)
+        self.merge_candidates(self.root)
+
+        # Keywords are matched at every position through a lookahead, so one scan finds them all
+        # and the lowest index among the hits reproduces the elif chain's priority
+        self.command_names = [name for name, _ in command_keywords] + ["login"]
+        keywords = [keyword for _, keyword in command_keywords] + ["login"]
+        self.command_regex = re.compile(
+            "(?=(?:" + "|".join(f"(?P<c{index}>{re.escape(keyword)})" for index, keyword in enumerate(keywords)) + "))")
+        self.login_index = len(keywords) - 1
+
+        sorted_reflections = sorted(reflections, key=len, reverse=True)
+        self.reflections = reflections
+        self.reflection_regex = re.compile(r"\b({})\b".format("|".join(map(re.escape, sorted_reflections))), re.IGNORECASE)
+
+    def merge_candidates(self, node):
+        # Each node inherits its ancestors' patterns; nodes that add nothing share the parent's tuple
+        stack = [(node, node.candidates)]
+        while stack:
+            node, inherited = stack.pop()
+            for child in node.children.values():
+                own = child.candidates
+                child.candidates = tuple(sorted(set(inherited + own))) if own else inherited
+                stack.append((child, child.candidates))
+
+    def compile_candidates(self, candidates):
+        # Each candidate becomes one named alternative; regex alternation tries them left to right,
+        # so the first alternative to match is the same pair a sequential scan would pick
+        alternatives = []
+        pattern_groups = {}
+        group = 0
+        for index in candidates:
+            pattern, responses = self.pairs[index]
+            group += 1
+            inner_groups = re.compile(pattern).groups
+            pattern_groups[group] = (index, group, inner_groups, responses)
+            alternatives.append(f"(?P<p{index}>{pattern})")
+            group += inner_groups
+        compiled = (re.compile("|".join(alternatives), re.IGNORECASE), pattern_groups)
+        self.compiled[candidates] = compiled
+        return compiled
+
+    def candidates_for(self, text):
+        # Walk the trie as far as the message goes; non-ASCII text could case-fold onto a prefix, so try everything
+        if not text.isascii():
+            return self.all_candidates
+        node = self.root
+        for char in text:
+            child = node.children.get(char)
+            if child is None:
+                break
+            node = child
+        return node.candidates
+
+    def reflect(self, text):
+        return self.reflection_regex.sub(lambda mo: self.reflections[mo.group(0)], text.lower())
+
+    def fill(self, response, captures):
+        # Replace %1, %2, ... with the reflected captures, then tidy the trailing punctuation
+        pos = response.find("%")
+        while pos >= 0:
+            num = int(response[pos + 1:pos + 2])
+            response = response[:pos] + self.reflect(captures[num - 1]) + response[pos + 2:]
+            pos = response.find("%")
+        if response[-2:] == "?.":
+            response = response[:-2] + "."
+        if response[-2:] == "??":
+            response = response[:-2] + "?"
+        return response
+
+    def match(self, message):
+        pattern_index = response = None
+        captures = ()
+        text = message.lower()
+        candidates = self.candidates_for(text)
+        pattern_regex, pattern_groups = self.compiled.get(candidates) or self.compile_candidates(candidates)
+        found = pattern_regex.match(message)
+        if found:
+            # The wrapping group closes last, so lastindex identifies which pair matched
+            pattern_index, group, inner_groups, responses = pattern_groups[found.lastindex]
+            captures = found.groups()[group:group + inner_groups]
+            response = self.fill(random.choice(responses), captures)
+
+        hits = {int(hit.lastgroup[1:]) for hit in self.command_regex.finditer(text)}
+        login = self.login_index in hits
+        hits.discard(self.login_index)
+        command = self.command_names[min(hits)] if hits else None
+        return Intent(pattern_index, response, captures, command, login)
+
+
+class RuleBasedChatbot:
+    def __init__(self, pairs):
+        self.matcher = IntentMatcher(pairs, command_keywords, reflections)
+
+    def match(self, user_input):
+        return self.matcher.match(user_input)
+
+    def respond(self, user_input):
+        return self.matcher.match(user_input).response
+
+
+# Initialize the rule-based chatbot
+chatbot = RuleBasedChatbot(pairs)
+
+
+def read_medical_advice(path=ADVICE_TIPS_PATH):
+    df = pd.read_csv(path)
+    return df['Medical Advices'].tolist()
+
+
+def read_disease_advice(dataset_path=DATASET_PATH):
+    # One document per disease, led by its name so symptom and diagnosis queries find it
+    dataset = pd.read_csv(dataset_path).drop_duplicates('Disease')
+    return [f"{disease}: {advice[:1].upper()}{advice[1:]}"
+            for disease, advice in zip(dataset['Disease'], dataset['Medical advice'])]
+
+
+# Index of every piece of advice, rebuilt when MedicalAdvices.csv or the disease dataset changes
+ADVICE_INDEX_VERSION = 1
+ADVICE_INDEX_MAGIC = b'HBADVICE'
+ADVICE_INDEX_PATH = 'advice.index'
+BM25_K1 = 1.2
+BM25_B = 0.75
+ADVICE_TOKEN = re.compile(r"[a-z0-9]+")
+ADVICE_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have i if in into is it its me my no not of on or our so "
+    "than that the their then there these they this to too was we what when which while who will with you your".split())
+
+
+def advice_terms(text):
+    # Lowercase words without stopwords; a plural 's' is dropped so 'headaches' finds 'headache'
+    return [word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+            for word in ADVICE_TOKEN.findall(text.lower()) if word not in ADVICE_STOPWORDS]
+
+
+def advice_term_hash(term):
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class AdviceIndex:
+    # BM25 inverted index over the advice corpus, memory-mapped from a single file.
+    # Documents 0 .. tips-1 are general tips (the daily rotation); the rest is per-disease advice.
+    #   term_hashes[term]  sorted uint64 advice_term_hash of every term; a term's id is its position, so
+    #                      looking one up is a binary search in the mapping and opening the file reads nothing
+    #   term_offsets[term] .. term_offsets[term + 1] index the term's postings in doc_ids (int32)
+    #   and weights (float32), where each weight is the term's full BM25 contribution to that document
+    #   text holds the documents as UTF-8, split by text_offsets
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.buffer = buffer
+        self.tips = header['tips']
+        self.count = header['documents']
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    @classmethod
+    def build(cls, tips, advice, path=ADVICE_INDEX_PATH, source_hash=None, k1=BM25_K1, b=BM25_B):
+        documents = list(tips) + list(advice)
+        count = len(documents)
+        vocabulary = {}
+        lengths = np.empty(count, dtype=np.int64)
+        term_ids = []
+        for document, text in enumerate(documents):
+            terms = advice_terms(text)
+            lengths[document] = len(terms)
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+
+        # Term ids follow hash order, so term_hashes comes out sorted
+        hashes = np.fromiter(map(advice_term_hash, vocabulary), dtype=np.uint64, count=len(vocabulary))
+        order = np.argsort(hashes)
+        if len(hashes) and (np.diff(hashes[order]) == 0).any():
+            raise ValueError("Two advice terms share a hash")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        # Term frequencies from one sort of (term, document) keys, which also orders the postings
+        keys, frequencies = np.unique(rank[np.array(term_ids, dtype=np.int64)] * count
+                                      + np.repeat(np.arange(count, dtype=np.int64), lengths), return_counts=True)
+        terms, doc_ids = np.divmod(keys, count)
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = max(lengths.mean(), 1.0) if count else 1.0
+        weights = idf[terms] * frequencies * (k1 + 1) / (
+            frequencies + k1 * (1 - b + b * lengths[doc_ids] / average_length))
+
+        text = [document.encode('utf-8') for document in documents]
+        arrays = {
+            'term_offsets': np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64),
+            'doc_ids': doc_ids.astype(np.int32),
+            'weights': weights.astype(np.float32),
+            'term_hashes': hashes[order],
+            'text_offsets': np.concatenate([[0], np.cumsum([len(entry) for entry in text])]).astype(np.int64),
+            'text': np.frombuffer(b''.join(text), dtype=np.uint8),
+        }
+        header = {
+            'version': ADVICE_INDEX_VERSION,
+            'tips': len(tips),
+            'documents': count,
+            'terms': len(vocabulary),
+            'k1': k1,
+            'b': b,
+            'source_hash': source_hash,
+        }
+        return write_array_file(path, ADVICE_INDEX_MAGIC, header, arrays)
+
+    @classmethod
+    def load(cls, path=ADVICE_INDEX_PATH):
+        return cls(*read_array_file(path, ADVICE_INDEX_MAGIC, ADVICE_INDEX_VERSION, 'advice index'))
+
+    def document(self, document):
+        return self.text[self.text_offsets[document]:self.text_offsets[document + 1]].tobytes().decode('utf-8')
+
+    def search(self, query, k=3, exclude=()):
+        # Top k (document, score) by BM25, best first; documents sharing no term with the query never match
+        terms = self.term_ids(set(advice_terms(query)))
+        if not len(terms):
+            return []
+        documents = np.concatenate([self.doc_ids[self.term_offsets[term]:self.term_offsets[term + 1]] for term in terms])
+        weights = np.concatenate([self.weights[self.term_offsets[term]:self.term_offsets[term + 1]] for term in terms])
+        # Few postings: sum per distinct document; many: one dense pass over the whole corpus
+        if len(documents) * 16 < self.count:
+            documents, slots = np.unique(documents, return_inverse=True)
+            scores = np.bincount(slots, weights)
+        else:
+            scores = np.bincount(documents, weights, minlength=self.count)
+            documents = None
+        if exclude:
+            excluded = list(exclude) if documents is None else np.isin(documents, list(exclude))
+            scores[excluded] = 0.0
+
+        # k passes of argmax: linear, ties go to the lower document, and unlike argpartition it does
+        # not slow down on the many equal scores BM25 gives short documents sharing one term
+        results = []
+        for _ in range(k):
+            slot = int(scores.argmax()) if len(scores) else 0
+            if not len(scores) or scores[slot] <= 0:
+                break
+            results.append((slot if documents is None else int(documents[slot]), float(scores[slot])))
+            scores[slot] = 0.0
+        return results
+
+    def term_ids(self, terms):
+        # Binary search for each term's hash; terms not in the corpus are dropped
+        hashes = np.fromiter(map(advice_term_hash, terms), dtype=np.uint64, count=len(terms))
+        if not len(self.term_hashes):
+            return hashes[:0].astype(np.int64)
+        slots = np.minimum(np.searchsorted(self.term_hashes, hashes), len(self.term_hashes) - 1)
+        return slots[self.term_hashes[slots] == hashes]
+
+    def tip(self, number, seed=0):
+        # The number-th tip of a rotation that shows every tip once before any repeats. Each round is
+        # an affine permutation (step * position + shift) mod tips, with step coprime to tips, so the
+        # order differs per seed and per round without storing it
+        if not self.tips:
+            return None
+        rounds, position = divmod(number, self.tips)
+        mix = int.from_bytes(hashlib.sha256(f"{seed}:{rounds}".encode()).digest()[:8], 'little')
+        step = mix % self.tips or 1
+        while math.gcd(step, self.tips) != 1:
+            step += 1
+        return (step * position + (mix >> 32)) % self.tips
+
+
+def load_advice_index(path=ADVICE_INDEX_PATH, tips_path=ADVICE_TIPS_PATH, dataset_path=DATASET_PATH):
+    # Reuse the index on disk while its sources are unchanged, otherwise rebuild it
+    source_hash = hash_files([tips_path, dataset_path])
+    try:
+        index = AdviceIndex.load(path)
+        if index.header['source_hash'] == source_hash:
+            return index
+    except (OSError, ValueError):
+        pass
+    AdviceIndex.build(read_medical_advice(tips_path), read_disease_advice(dataset_path), path, source_hash)
+    return AdviceIndex.load(path)
+
+
+def symptom_query(answers, disease=None):
+    # Search words for a health check: the symptoms answered 'yes', abnormal readings and the prediction.
+    # Older checks stored some answers as typed, so they are compared case-insensitively
+    answer = lambda key: str(answers.get(key, '')).strip().lower()
+    words = [word for key, word in [('Fever', 'fever'), ('Cough', 'cough'), ('Fatigue', 'fatigue'),
+                                    ('Difficulty Breathing', 'difficulty breathing')] if answer(key) == 'yes']
+    for key, label in [('Blood Pressure', 'blood pressure'), ('Cholesterol Level', 'cholesterol')]:
+        if answer(key) in ('low', 'high'):
+            words.append(f"{answer(key)} {label}")
+    if disease:
+        words.append(disease)
+    return ' '.join(words)
+
+GREETING = "Hi! I am Your Virtual AI Doctor, What can I help you with today? You can type 'login' for Medical Assistant 🧑‍⚕️"
+
+# Questions asked during a health check: (answer key, prompt, accepted answers, how the answer is stored, warning)
+HEALTH_CHECK_QUESTIONS = [
+    ('day', "How did your day go?", None, 'text', None),
+    ('Fever', "Do you have any Fever? (yes/no)", ["yes", "no"], 'lower', "Please enter 'yes' or 'no'."),
+    ('Cough', "Do you have any Cough? (yes/no)", ["yes", "no"], 'lower', "Please enter 'yes' or 'no'."),
+    ('Fatigue', "Do you have any Fatigue? (yes/no)", ["yes", "no"], 'lower', "Please enter 'yes' or 'no'."),
+    ('Difficulty Breathing', "Do you have any Difficulty Breathing? (yes/no)", ["yes", "no"], 'lower', "Please enter 'yes' or 'no'."),
+    ('Age', "What is your Age? (Answer)", None, 'int', "Please enter a valid number."),
+    ('Gender', "What is your Gender? (male/female)", ["male", "female"], 'lower', "Please enter 'male' or 'female'."),
+    ('Blood Pressure', "What is your Blood Pressure? (low | normal | high)", ["low", "normal", "high"], 'lower', "Please enter only 'low' or 'normal' or 'high' for blood pressure"),
+    ('Cholesterol Level', "What is your Cholesterol Level? (low | normal | high)", ["low", "normal", "high"], 'lower', "Please enter only 'low' or 'normal' or 'high' for cholesterol level"),
+]
+
+
+def next_reminder_delay(reminder_time, now=None):
+    # Seconds until the next occurrence of a daily HH:MM time
+    now = now or datetime.now()
+    today_reminder_time = datetime.combine(now.date(), reminder_time)
+    if now > today_reminder_time:
+        today_reminder_time += timedelta(days=1)
+    return (today_reminder_time - now).total_seconds()
+
+
+def next_appointment_delay(time_str, now=None):
+    # Seconds until the next occurrence of an HH:MM AM/PM time
+    now = now or datetime.now()
+    appointment_time = datetime.strptime(time_str, '%I:%M %p')
+    appointment_time = now.replace(hour=appointment_time.hour, minute=appointment_time.minute, second=0, microsecond=0)
+    if appointment_time < now:
+        appointment_time += timedelta(days=1)
+    return (appointment_time - now).total_seconds()
+
+
+class HealthRecordStore:
+    # Append-only history of health checks in SQLite (WAL mode), indexed by patient and time.
+    # Each thread gets its own connection, so the worker pool and the event loop can share one store.
+    def __init__(self, path=RECORD_STORE_PATH):
+        self.path = path
+        self.local = threading.local()
+        with self.connection() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS health_checks (
+                    id INTEGER PRIMARY KEY,
+                    patient TEXT NOT NULL,
+                    checked_at TEXT NOT NULL,
+                    answers TEXT NOT NULL,
+                    predicted_disease TEXT,
+                    medical_advice TEXT
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS health_checks_by_patient ON health_checks (patient, checked_at, id)")
+            # Training log: the answers of a check together with the diagnosis a doctor confirmed
+            db.execute(f"""
+                CREATE TABLE IF NOT EXISTS outcomes (
+                    id INTEGER PRIMARY KEY,
+                    recorded_at TEXT NOT NULL,
+                    patient TEXT,
+                    check_id INTEGER,
+                    {', '.join(f'{column} {kind}' for column, kind in OUTCOME_COLUMNS.values())},
+                    disease TEXT NOT NULL
+                )""")
+            # How many daily tips each patient has been shown, so the rotation survives restarts
+            db.execute("CREATE TABLE IF NOT EXISTS advice_rotation (patient TEXT PRIMARY KEY, shown INTEGER NOT NULL)")
+
+    def connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def close(self):
+        # Closes the calling thread's connection only
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+    def add_check(self, patient, answers, predicted_disease, medical_advice, checked_at=None):
+        checked_at = checked_at or time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.connection() as db:
+            cursor = db.execute(
+                "INSERT INTO health_checks (patient, checked_at, answers, predicted_disease, medical_advice) VALUES (?, ?, ?, ?, ?)",
+                (patient, checked_at, json.dumps(answers), predicted_disease, medical_advice))
+        return cursor.lastrowid
+
+    def add_checks(self, checks):
+        # Bulk insert of (patient, checked_at, answers, predicted_disease, medical_advice) in one transaction
+        with self.connection() as db:
+            db.executemany(
+                "INSERT INTO health_checks (patient, checked_at, answers, predicted_disease, medical_advice) VALUES (?, ?, ?, ?, ?)",
+                ((patient, checked_at, json.dumps(answers), predicted, advice)
+                 for patient, checked_at, answers, predicted, advice in checks))
+
+    def has_patient(self, patient):
+        return self.connection().execute(
+            "SELECT 1 FROM health_checks WHERE patient = ? LIMIT 1", (patient,)).fetchone() is not None
+
+    def latest_check(self, patient):
+        row = self.connection().execute(
+            "SELECT * FROM health_checks WHERE patient = ? ORDER BY checked_at DESC, id DESC LIMIT 1", (patient,)).fetchone()
+        return self.row_to_check(row) if row else None
+
+    def history(self, patient, limit=10, offset=0):
+        # Newest first, one page at a time
+        rows = self.connection().execute(
+            "SELECT * FROM health_checks WHERE patient = ? ORDER BY checked_at DESC, id DESC LIMIT ? OFFSET ?",
+            (patient, limit, offset)).fetchall()
+        return [self.row_to_check(row) for row in rows]
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM health_checks").fetchone()[0]
+
+    def iter_histories(self, batch_size=1000, limit=10):
+        # Every patient in name order, batch_size at a time, as lists of (patient, latest check,
+        # (checked_at, predicted_disease) of the newest limit checks, number of checks, highest check id).
+        # Only the latest check's answers are decoded; the rest of the history does not need them
+        db = self.connection()
+        patients = []
+        while True:
+            if patients:
+                rows = db.execute("SELECT DISTINCT patient FROM health_checks WHERE patient > ? ORDER BY patient LIMIT ?",
+                                  (patients[-1], batch_size))
+            else:
+                rows = db.execute("SELECT DISTINCT patient FROM health_checks ORDER BY patient LIMIT ?", (batch_size,))
+            patients = [row[0] for row in rows]
+            if not patients:
+                return
+            rows = db.execute("""
+                SELECT * FROM (
+                    SELECT id, patient, checked_at, CASE WHEN position = 1 THEN answers END AS answers,
+                           predicted_disease, medical_advice, position, total, newest
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER recent AS position, COUNT(*) OVER everything AS total,
+                               MAX(id) OVER everything AS newest
+                        FROM health_checks WHERE patient BETWEEN ? AND ?
+                        WINDOW recent AS (PARTITION BY patient ORDER BY checked_at DESC, id DESC),
+                               everything AS (PARTITION BY patient)))
+                WHERE position <= ? ORDER BY patient, position""", (patients[0], patients[-1], limit))
+            histories = []
+            for patient, group in itertools.groupby(rows, key=lambda row: row['patient']):
+                first = next(group)
+                latest = self.row_to_check(first)
+                del latest['position'], latest['total'], latest['newest']
+                history = [(latest['checked_at'], latest['predicted_disease'])]
+                history.extend((row['checked_at'], row['predicted_disease']) for row in group)
+                histories.append((patient, latest, history, first['total'], first['newest']))
+            yield histories
+
+    def next_tip_number(self, patient):
+        # 0 for a patient's first daily tip, then 1, 2, ...
+        with self.connection() as db:
+            db.execute("INSERT INTO advice_rotation (patient, shown) VALUES (?, 0) "
+                       "ON CONFLICT(patient) DO UPDATE SET shown = shown + 1", (patient,))
+            return db.execute("SELECT shown FROM advice_rotation WHERE patient = ?", (patient,)).fetchone()[0]
+
+    def add_outcome(self, patient, features, disease, check_id=None):
+        # features holds the answers keyed like the dataset columns, as check_features returns them
+        self.add_outcomes([(patient, features, disease, check_id)])
+
+    def add_outcomes(self, outcomes):
+        # Bulk insert of (patient, features, disease, check_id) in one transaction
+        recorded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        columns = [column for column, _ in OUTCOME_COLUMNS.values()]
+        with self.connection() as db:
+            db.executemany(
+                f"INSERT INTO outcomes (recorded_at, patient, check_id, {', '.join(columns)}, disease) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(columns))}, ?)",
+                ((recorded_at, patient, check_id, *[features.get(name) for name in OUTCOME_COLUMNS], disease)
+                 for patient, features, disease, check_id in outcomes))
+
+    def outcome_count(self, after_id=0):
+        return self.connection().execute("SELECT COUNT(*) FROM outcomes WHERE id > ?", (after_id,)).fetchone()[0]
+
+    def training_log(self, after_id=0):
+        # Outcomes newer than after_id as a frame with the dataset's columns, plus the last id read
+        columns = ', '.join(f'{column} AS "{name}"' for name, (column, _) in OUTCOME_COLUMNS.items())
+        frame = pd.read_sql_query(f'SELECT id, {columns}, disease AS "Disease" FROM outcomes WHERE id > ? ORDER BY id',
+                                  self.connection(), params=(after_id,))
+        last_id = int(frame['id'].iloc[-1]) if len(frame) else after_id
+        return last_id, frame.drop(columns='id')
+
+    def row_to_check(self, row):
+        check = dict(row)
+        check['answers'] = json.loads(check['answers'])
+        return check
+
+    def import_text_reports(self, folder):
+        # Load legacy {name}_health_report.txt files; a file already imported (same patient and date) is skipped
+        checks = []
+        for path in sorted(glob.glob(os.path.join(folder, '*_health_report.txt'))):
+            with open(path, 'r') as file:
+                check = parse_text_report(file.read())
+            if check and not self.connection().execute(
+                    "SELECT 1 FROM health_checks WHERE patient = ? AND checked_at = ? LIMIT 1",
+                    (check[0], check[1])).fetchone():
+                checks.append(check)
+        self.add_checks(checks)
+        return len(checks)
+
+
+def render_report(check):
+    # Same layout save_health_data used to write to {name}_health_report.txt
+    lines = [f"Health Report for {check['patient']}", f"Date: {check['checked_at']}", ""]
+    for question, answer in check['answers'].items():
+        lines.append(f"{question.capitalize()}: {answer}")
+    lines.append("")
+    lines.append(f"Predicted Disease: {check['predicted_disease']}")
+    lines.append(f"Medical Advice: {check['medical_advice']}")
+    return "\n".join(lines) + "\n"
+
+
+REPORT_STYLE = ("body { font-family: monospace; max-width: 50em; margin: 2em auto; } "
+                "table { border-collapse: collapse; } th, td { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: left; }")
+
+
+def render_report_html(report):
+    # The render_report layout as a standalone page, followed by the current model's assessment of the
+    # latest check and the patient's recent history. report is what ReportExporter hands its workers
+    escape = html.escape
+    patient = escape(report['patient'])
+    latest = report['latest']
+    lines = ["<!DOCTYPE html>",
+             f'<html><head><meta charset="utf-8"><title>Health Report for {patient}</title>'
+             f"<style>{REPORT_STYLE}</style></head><body>",
+             f"<h1>Health Report for {patient}</h1>",
+             f"<p>Date: {escape(latest['checked_at'])}</p>",
+             "<table>"]
+    for question, answer in latest['answers'].items():
+        lines.append(f"<tr><th>{escape(question.capitalize())}</th><td>{escape(str(answer))}</td></tr>")
+    lines.append("</table>")
+    lines.append(f"<p>Predicted Disease: {escape(str(latest['predicted_disease']))}<br>"
+                 f"Medical Advice: {escape(str(latest['medical_advice']))}</p>")
+
+    assessment = report['assessment']
+    lines.append("<h2>Current Assessment</h2>")
+    lines.append(f"<p>Predicted Disease: {escape(assessment['disease'])} ({assessment['confidence']:.0%} confidence)<br>"
+                 f"Medical Advice: {escape(assessment['advice'])}</p>")
+
+    shown = len(report['history'])
+    lines.append("<h2>History</h2>")
+    lines.append(f"<p>{report['total']} health check{'s' if report['total'] != 1 else ''} on record"
+                 + (f", newest {shown} shown" if report['total'] > shown else "") + ".</p>")
+    lines.append("<table><tr><th>Date</th><th>Predicted Disease</th></tr>")
+    for checked_at, predicted_disease in report['history']:
+        lines.append(f"<tr><td>{escape(checked_at)}</td><td>{escape(str(predicted_disease))}</td></tr>")
+    lines.append("</table></body></html>")
+    return "\n".join(lines) + "\n"
+
+
+def parse_text_report(text):
+    # Inverse of render_report; returns (patient, checked_at, answers, predicted_disease, medical_advice) or None
+    lines = text.splitlines()
+    if len(lines) < 2 or not lines[0].startswith("Health Report for ") or not lines[1].startswith("Date: "):
+        return None
+    patient = lines[0][len("Health Report for "):]
+    checked_at = lines[1][len("Date: "):]
+    # render_report capitalises the answer keys; map them back to the health check's own keys and types
+    questions = {key.lower(): (key, kind) for key, _, _, kind, _ in HEALTH_CHECK_QUESTIONS}
+    answers = {}
+    predicted_disease = medical_advice = None
+    for line in lines[2:]:
+        key, separator, value = line.partition(": ")
+        if not separator:
+            continue
+        if key == "Predicted Disease":
+            predicted_disease = value
+        elif key == "Medical Advice":
+            medical_advice = value
+        else:
+            key, kind = questions.get(key.lower(), (key, 'text'))
+            if kind == 'int':
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+            answers[key] = value
+    return patient, checked_at, answers, predicted_disease, medical_advice
+
+
+# A reminder handled more than this long after its time is reported as missed
+REMINDER_GRACE_SECONDS = 60
+
+# Repeat intervals; 'once' reminders are retired after they fire
+REMINDER_PERIODS = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1)}
+
+
+def next_occurrence(timestamp, period):
+    # Step in local wall-clock time so a daily 08:00 reminder stays at 08:00 across DST changes
+    return (datetime.fromtimestamp(timestamp) + period).timestamp()
+
+
+# ReminderScheduler scope that covers every patient, as the chat service needs
+ALL_PATIENTS = object()
+
+
+class ReminderScheduler:
+    # Persistent reminders kept in a heap ordered by next fire time, so one timer can drive any number
+    # of them: the owner sleeps for next_delay() seconds, then calls due() and sleeps again.
+    # patient limits it to one patient's reminders (None: nobody's); processes sharing the database
+    # claim each reminder in the database before firing it, so it fires in one of them only.
+    def __init__(self, path=RECORD_STORE_PATH, clock=time.time, patient=ALL_PATIENTS):
+        self.clock = clock
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id INTEGER PRIMARY KEY,
+                    patient TEXT,
+                    kind TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    next_fire REAL NOT NULL,
+                    repeat TEXT NOT NULL,
+                    active INTEGER NOT NULL DEFAULT 1
+                )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS reminders_by_patient ON reminders (patient, active)")
+            # Reminders that fired while their patient was not connected, kept until the patient logs in
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS reminder_outbox (
+                    id INTEGER PRIMARY KEY,
+                    patient TEXT,
+                    fired_at REAL NOT NULL,
+                    text TEXT NOT NULL
+                )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS reminder_outbox_by_patient ON reminder_outbox (patient, id)")
+
+        self.scope(patient)
+
+    def scope(self, patient):
+        # (Re)load the active reminders of patient. Anything still active was either pending or missed
+        # while nobody was watching; due() catches up
+        self.patient = patient
+        self.reminders = {}
+        self.heap = []
+        if patient is ALL_PATIENTS:
+            rows = self.db.execute("SELECT id, patient, kind, label, next_fire, repeat FROM reminders WHERE active = 1")
+        elif patient is None:
+            rows = []
+        else:
+            rows = self.db.execute("SELECT id, patient, kind, label, next_fire, repeat FROM reminders "
+                                   "WHERE active = 1 AND patient = ?", (patient,))
+        for reminder_id, patient, kind, label, next_fire, repeat in rows:
+            self.reminders[reminder_id] = {'id': reminder_id, 'patient': patient, 'kind': kind, 'label': label,
+                                           'next_fire': next_fire, 'repeat': repeat}
+            self.heap.append((next_fire, reminder_id))
+        heapq.heapify(self.heap)
+
+    def in_scope(self, patient):
+        return self.patient is ALL_PATIENTS or patient == self.patient
+
+    def add(self, patient, kind, label, first_fire, repeat='once'):
+        if repeat != 'once' and repeat not in REMINDER_PERIODS:
+            raise ValueError(f"Unknown repeat interval: {repeat}")
+        with self.db:
+            reminder_id = self.db.execute(
+                "INSERT INTO reminders (patient, kind, label, next_fire, repeat) VALUES (?, ?, ?, ?, ?)",
+                (patient, kind, label, first_fire, repeat)).lastrowid
+        if self.in_scope(patient):
+            self.reminders[reminder_id] = {'id': reminder_id, 'patient': patient, 'kind': kind, 'label': label,
+                                           'next_fire': first_fire, 'repeat': repeat}
+            heapq.heappush(self.heap, (first_fire, reminder_id))
+        return reminder_id
+
+    def cancel(self, reminder_id):
+        # The heap entry is left behind and skipped when it reaches the top
+        with self.db:
+            self.db.execute("UPDATE reminders SET active = 0 WHERE id = ?", (reminder_id,))
+        self.reminders.pop(reminder_id, None)
+
+    def hold(self, reminder, text):
+        # Keep a fired reminder nobody received until its patient next logs in
+        with self.db:
+            self.db.execute("INSERT INTO reminder_outbox (patient, fired_at, text) VALUES (?, ?, ?)",
+                            (reminder['patient'], reminder['next_fire'], text))
+
+    def take_held(self, patient):
+        # The patient's held reminders as [(fired_at, text)], oldest first; they are removed once handed out
+        with self.db:
+            rows = self.db.execute("SELECT id, fired_at, text FROM reminder_outbox WHERE patient = ? ORDER BY id",
+                                   (patient,)).fetchall()
+            if rows:
+                self.db.execute("DELETE FROM reminder_outbox WHERE patient = ? AND id <= ?", (patient, rows[-1][0]))
+        return [(fired_at, text) for _, fired_at, text in rows]
+
+    def reminders_for(self, patient):
+        return sorted((reminder for reminder in self.reminders.values() if reminder['patient'] == patient),
+                      key=lambda reminder: reminder['next_fire'])
+
+    def next_delay(self):
+        # Seconds until the earliest reminder (0 when one is overdue), or None when nothing is scheduled
+        while self.heap:
+            next_fire, reminder_id = self.heap[0]
+            reminder = self.reminders.get(reminder_id)
+            if reminder is not None and reminder['next_fire'] == next_fire:
+                return max(0.0, next_fire - self.clock())
+            heapq.heappop(self.heap)
+        return None
+
+    def due(self):
+        # Pop every reminder whose time has come. Each fires once even if several occurrences were
+        # missed; recurring ones move to their first slot after now. Returns [(reminder, missed)].
+        now = self.clock()
+        fired = []
+        with self.db:
+            while self.heap and self.heap[0][0] <= now:
+                fire_time, reminder_id = heapq.heappop(self.heap)
+                reminder = self.reminders.get(reminder_id)
+                if reminder is None or reminder['next_fire'] != fire_time:
+                    continue
+                if reminder['repeat'] == 'once':
+                    next_fire = None
+                    claimed = self.db.execute("UPDATE reminders SET active = 0 WHERE id = ? AND active = 1 AND next_fire = ?",
+                                              (reminder_id, fire_time)).rowcount
+                else:
+                    next_fire = fire_time
+                    while next_fire <= now:
+                        next_fire = next_occurrence(next_fire, REMINDER_PERIODS[reminder['repeat']])
+                    claimed = self.db.execute("UPDATE reminders SET next_fire = ? WHERE id = ? AND active = 1 AND next_fire = ?",
+                                              (next_fire, reminder_id, fire_time)).rowcount
+                if not claimed:
+                    # Another process fired or cancelled it first; follow the database from here on
+                    self.refresh(reminder_id)
+                    continue
+                fired.append((dict(reminder), now - fire_time > REMINDER_GRACE_SECONDS))
+                if next_fire is None:
+                    del self.reminders[reminder_id]
+                else:
+                    reminder['next_fire'] = next_fire
+                    heapq.heappush(self.heap, (next_fire, reminder_id))
+        return fired
+
+    def refresh(self, reminder_id):
+        row = self.db.execute("SELECT next_fire FROM reminders WHERE id = ? AND active = 1", (reminder_id,)).fetchone()
+        if row is None:
+            self.reminders.pop(reminder_id, None)
+        else:
+            self.reminders[reminder_id]['next_fire'] = row[0]
+            heapq.heappush(self.heap, (row[0], reminder_id))
+
+    def close(self):
+        self.db.close()
+
+
+def reminder_text(reminder):
+    if reminder['kind'] == 'appointment':
+        return f"You have an appointment with Dr. {reminder['label']}."
+    return f"Time to take your medicine: {reminder['label']}"
+
+
+def check_features(answers):
+    # Health check answers keyed like the dataset columns, the form the model and the training log use
+    return {
+        'Fever': answers.get('Fever'),
+        'Cough': answers.get('Cough'),
+        'Fatigue': answers.get('Fatigue'),
+        'Difficulty breathing': answers.get('Difficulty Breathing'),
+        'Age': answers.get('Age'),
+        'Gender': answers.get('Gender'),
+        'Blood pressure': answers.get('Blood Pressure'),
+        'Cholesterol level': answers.get('Cholesterol Level')
+    }
+
+
+# Seconds an advice request waits for the advice index to finish loading at startup
+ADVICE_WAIT = 60
+
+
+class HealthServices:
+    # Backends shared by every chat session. Methods that touch the model or the disk block,
+    # so sessions hand them back as Deferred work instead of calling them directly.
+    def __init__(self, record_store, model_updater=None):
+        self.record_store = record_store
+        self.predictor = None
+        self.advice_index = None
+        # Set once loading the advice index has finished, whether or not it succeeded
+        self.advice_ready = threading.Event()
+
+        # Confirmed diagnoses are folded into the model on one background thread; the new
+        # predictor replaces the old one in a single assignment, so requests never see a partial model
+        self.model_updater = model_updater or ModelUpdater(record_store)
+        self.model_updates = concurrent.futures.ThreadPoolExecutor(1)
+        self.model_update = None
+
+    def health_check_unavailable(self):
+        if self.predictor is None:
+            return "The health check is still getting ready ⏳. Please try again in a moment."
+        return None
+
+    def check_existing_patient(self, name):
+        return self.record_store.has_patient(name)
+
+    def save_health_data(self, responses, patient_name):
+        # Prepare patient data from responses; the predictor's encoder does the rest
+        patient_data = check_features(responses)
+
+        # Predict disease and get medical advice
+        predicted_disease, medical_advice = self.predictor.predict_disease(patient_data)
+
+        # Append the check to the patient's history; earlier checks are kept
+        self.record_store.add_check(patient_name, responses, predicted_disease, medical_advice)
+
+    def view_health_report(self, patient_name):
+        check = self.record_store.latest_check(patient_name)
+        if check is None:
+            return (
+                "No health report found. Please complete a health check first before viewing your health report.\n"
+                "Type 'health check' to get started."
+            )
+        return (f"Here is your health report:\n\n{render_report(check)}\n\n"
+                "Type 'symptom advice' for advice on these symptoms. If a doctor has confirmed what you have, "
+                "type 'confirm diagnosis' so Health Buddy can learn from it.")
+
+    def view_health_history(self, patient_name, limit=5):
+        checks = self.record_store.history(patient_name, limit)
+        if not checks:
+            return "No health checks recorded yet. Type 'health check' to get started."
+        lines = [f"{check['checked_at']}: {check['predicted_disease']}" for check in checks]
+        return "Your most recent health checks:\n\n" + "\n".join(lines)
+
+    def find_disease(self, text):
+        # The disease name as the model knows it, matched case-insensitively, or None
+        known = {disease.lower(): disease for disease in getattr(self.predictor, 'advice', {})}
+        return known.get(text.strip().lower())
+
+    def confirm_diagnosis(self, patient_name, disease):
+        # Log the confirmed disease against the patient's latest check, for the next model update
+        check = self.record_store.latest_check(patient_name)
+        if check is None:
+            return False
+        self.record_store.add_outcome(patient_name, check_features(check['answers']), disease, check['id'])
+        self.request_model_update()
+        return True
+
+    def request_model_update(self, force=False):
+        # Only scikit-learn models can grow; a compact forest is replaced by exporting it again
+        if not isinstance(self.predictor, HealthPredictor):
+            return None
+        if self.model_update is None or self.model_update.done():
+            self.model_update = self.model_updates.submit(self.update_model, force)
+        return self.model_update
+
+    def update_model(self, force=False):
+        updated = self.model_updater.update(self.predictor, force)
+        if updated is not None:
+            self.predictor = updated
+        return updated
+
+    def wait_for_advice(self):
+        # Advice requests run as Deferred work, so they can wait for the startup load off the UI thread
+        self.advice_ready.wait(ADVICE_WAIT)
+
+    def daily_medical_advice(self, patient_name):
+        # Every tip is shown once, in a per-patient order, before any comes back
+        self.wait_for_advice()
+        if self.advice_index is None or not self.advice_index.tips:
+            return "Sorry, no medical advice is available at the moment."
+        tip = self.advice_index.tip(self.record_store.next_tip_number(patient_name), patient_name)
+        return f"Here's a piece of medical advice for you:\n\n{self.advice_index.document(tip)}"
+
+    def search_advice(self, text, k=3):
+        self.wait_for_advice()
+        if self.advice_index is None:
+            return []
+        return [self.advice_index.document(document) for document, _ in self.advice_index.search(text, k)]
+
+    def symptom_advice(self, patient_name, k=3):
+        # Advice for the symptoms and predicted disease of the latest check; None without a check
+        check = self.record_store.latest_check(patient_name)
+        if check is None:
+            return None
+        return self.search_advice(symptom_query(check['answers'], check['predicted_disease']), k)
+
+
+class Deferred:
+    # A reply that needs blocking work first: the caller runs fn(*args) off its UI or event-loop thread,
+    # then finish(result) turns the result into the reply text
+    def __init__(self, fn, args, finish):
+        self.fn = fn
+        self.args = args
+        self.finish = finish
+
+
+class ChatSession:
+    # One user's conversation, independent of any UI. handle() takes a message and returns the reply
+    # text or a Deferred; multi-turn flows (login, health check, reminders, appointments) are explicit states.
+    def __init__(self, services, scheduler=None):
+        self.services = services
+        # Anything with schedule_reminder(patient, med_name, reminder_time, repeat) and
+        # schedule_appointment(patient, doctor, time_str)
+        self.scheduler = scheduler
+        self.patient_name = None
+        self.medicine_reminders = []
+        self.appointments = []
+        self.state = 'chat'
+        self.health_answers = {}
+        self.question_index = 0
+        self.updating_health_check = False
+        self.pending_name = None
+        self.pending_time = None
+        self.closed = False
+
+    def handle(self, text):
+        text = text.strip()
+        message = text.lower()  # Normalize the user input
+        if self.state == 'chat':
+            return self.handle_chat(message)
+
+        # Any multi-turn flow can be abandoned
+        if message == "cancel":
+            self.state = 'chat'
+            return "Okay, I've cancelled that. What would you like to do next?"
+        return getattr(self, f"handle_{self.state}")(text, message)
+
+    def handle_chat(self, message):
+        # Chat pattern and command keywords come out of a single match
+        intent = chatbot.match(message)
+
+        # Handle general interactions first
+        response = intent.response
+        if response and not (intent.login or self.patient_name):
+            return response
+
+        # Handle the login process for user verification
+        if intent.login or not self.patient_name:
+            self.patient_name = None
+            self.state = 'login_name'
+            return "Please enter your name:"
+
+        # Logic for existing users: handle each command after login
+        if intent.command == "view_health_report":
+            return Deferred(self.services.view_health_report, (self.patient_name,), lambda report: report)
+
+        elif intent.command == "view_health_history":
+            return Deferred(self.services.view_health_history, (self.patient_name,), lambda history: history)
+
+        elif intent.command in ("health_check", "update_health_check"):
+            not_ready = self.services.health_check_unavailable()
+            if not_ready:
+                return not_ready
+            self.state = 'health_check'
+            self.health_answers = {}
+            self.question_index = 0
+            self.updating_health_check = intent.command == "update_health_check"
+            return HEALTH_CHECK_QUESTIONS[0][1]
+
+        elif intent.command == "daily_medical_advice":
+            return Deferred(self.services.daily_medical_advice, (self.patient_name,), lambda advice: advice)
+
+        elif intent.command == "symptom_advice":
+            return Deferred(self.services.symptom_advice, (self.patient_name,), self.symptom_advice_reply)
+
+        elif intent.command == "confirm_diagnosis":
+            not_ready = self.services.health_check_unavailable()
+            if not_ready:
+                return not_ready
+            self.state = 'confirm_diagnosis'
+            return "Which condition did your doctor confirm? (for example: Asthma)"
+
+        elif intent.command == "medicine_reminder":
+            self.state = 'medicine_name'
+            return "Enter the name of the medicine 💊:"
+
+        elif intent.command == "doctor_appointment":
+            self.state = 'doctor_name'
+            return "Enter the doctor name 👨‍⚕️:"
+
+        elif intent.command == "exit":
+            self.closed = True
+            return "Closing the application. Have a great day! 👋"
+
+        # Anything else may still be a health question the advice corpus can answer
+        return Deferred(self.services.search_advice, (message,), self.advice_reply)
+
+    def advice_reply(self, advice):
+        if not advice:
+            return "I'm sorry, I didn't understand that. Could you try rephrasing?"
+        lines = "\n".join(f"- {entry}" for entry in advice)
+        return f"Here is some advice that may help:\n\n{lines}"
+
+    def symptom_advice_reply(self, advice):
+        if advice is None:
+            return "Please complete a health check first, then ask for symptom advice.\nType 'health check' to get started."
+        if not advice:
+            return "I have no specific advice for your last health check. Type 'daily medical advice' for a general tip."
+        lines = "\n".join(f"- {entry}" for entry in advice)
+        return f"Advice for the symptoms in your last health check:\n\n{lines}"
+
+    def handle_login_name(self, text, message):
+        if text and re.match("^[A-Za-z ]*$", text):
+            self.state = 'chat'
+            self.patient_name = text
+            return Deferred(self.services.check_existing_patient, (text,),
+                            lambda existing: self.login_greeting(text, existing))
+        return "Please enter a valid name without numbers or special characters.\nPlease enter your name:"
+
+    def login_greeting(self, name, existing):
+        if existing:
+            # Welcome back message for existing users
+            return (
+                f"Welcome back, {name}!\n"
+                "What would you like to do today?\n"
+                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+
+            )
+        else:
+            # Greeting message for new users
+            return (
+                f"Hello {name}, it seems you're new here.\n"
+                "What would you like to explore today?\n"
+                "(Options: health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+            )
+
+    def handle_health_check(self, text, message):
+        key, prompt, choices, kind, warning = HEALTH_CHECK_QUESTIONS[self.question_index]
+        if choices and message not in choices:
+            return f"{warning}\n{prompt}"
+        if kind == 'int':
+            try:
+                answer = int(text)
+            except ValueError:
+                return f"{warning}\n{prompt}"
+        elif kind == 'lower':
+            answer = message
+        else:
+            answer = text
+        self.health_answers[key] = answer
+
+        self.question_index += 1
+        if self.question_index < len(HEALTH_CHECK_QUESTIONS):
+            return HEALTH_CHECK_QUESTIONS[self.question_index][1]
+
+        # All questions answered: predict and save off the caller's thread
+        self.state = 'chat'
+        if self.updating_health_check:
+            done = (
+                "Your health check details have been updated 😊.\n"
+                "What would you like to do next?\n"
+                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+            )
+        else:
+            done = (
+                "Thank you for providing your details. Your health data has been recorded 😊.\n"
+                "Explore more options:\n"
+                "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+            )
+        return Deferred(self.services.save_health_data, (self.health_answers, self.patient_name), lambda _: done)
+
+    def handle_confirm_diagnosis(self, text, message):
+        disease = self.services.find_disease(text)
+        if disease is None:
+            return "I don't know that condition, please check the spelling.\nWhich condition did your doctor confirm?"
+        self.state = 'chat'
+        return Deferred(self.services.confirm_diagnosis, (self.patient_name, disease),
+                        lambda saved: self.diagnosis_confirmed(disease, saved))
+
+    def diagnosis_confirmed(self, disease, saved):
+        if not saved:
+            return "Please complete a health check first, then confirm the diagnosis.\nType 'health check' to get started."
+        return (
+            f"Thank you, {disease} has been recorded with your latest health check. It helps Health Buddy learn 😊.\n"
+            "What would you like to do next?\n"
+            "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+        )
+
+    def handle_medicine_name(self, text, message):
+        if not text:
+            return "Enter the name of the medicine 💊:"
+        self.pending_name = text
+        self.state = 'medicine_time'
+        return "Enter the reminder time (HH:MM)⏰:"
+
+    def handle_medicine_time(self, text, message):
+        try:
+            if not re.match("^[0-2][0-9]:[0-5][0-9]$", text):
+                raise ValueError(text)
+            reminder_time = datetime.strptime(text, '%H:%M').time()
+        except ValueError:
+            return "Please enter a valid time in HH:MM format.\nEnter the reminder time (HH:MM)⏰:"
+        self.pending_time = reminder_time
+        self.state = 'medicine_repeat'
+        return "How often should I remind you? (once | daily | weekly)"
+
+    def handle_medicine_repeat(self, text, message):
+        if message not in ("once", "daily", "weekly"):
+            return "Please enter 'once', 'daily' or 'weekly'.\nHow often should I remind you? (once | daily | weekly)"
+        self.state = 'chat'
+        self.medicine_reminders.append((self.pending_name, self.pending_time, message))
+        if self.scheduler:
+            self.scheduler.schedule_reminder(self.patient_name, self.pending_name, self.pending_time, message)
+        return (
+            "Medicine reminder has been set 👍.\n"
+            "What would you like to do next?\n"
+            "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+        )
+
+    def handle_doctor_name(self, text, message):
+        if not text:
+            return "Enter the doctor name 👨‍⚕️:"
+        self.pending_name = text
+        self.state = 'doctor_time'
+        return "Enter the appointment time (HH:MM AM/PM)⏰:"
+
+    def handle_doctor_time(self, text, message):
+        try:
+            if not re.match(r'^\d{2}:\d{2} [APap][Mm]$', text):
+                raise ValueError(text)
+            datetime.strptime(text, '%I:%M %p')
+        except ValueError:
+            return "Please enter a valid time in HH:MM AM/PM format.\nEnter the appointment time (HH:MM AM/PM)⏰:"
+        self.state = 'chat'
+        self.appointments.append((self.pending_name, text))
+        if self.scheduler:
+            self.scheduler.schedule_appointment(self.patient_name, self.pending_name, text)
+        return (
+            "Doctor appointment has been scheduled 👍.\n"
+            "What would you like to do next?\n"
+            "(Options: view health report, update health check, daily medical advice, medicine reminder, doctor appointment, exit)"
+        )
+
+
+class StartupLoader(QThread):
+    # Loads the advice index and the prediction model while the window is already usable
+    advice_loaded = pyqtSignal(object)
+    advice_failed = pyqtSignal(str)
+    model_loaded = pyqtSignal(object)
+    model_failed = pyqtSignal(str)
+
+    def __init__(self, compact_model=None, parent=None):
+        super().__init__(parent)
+        self.compact_model = compact_model
+
+    def run(self):
+        try:
+            self.advice_loaded.emit(load_advice_index())
+        except Exception as e:
+            self.advice_failed.emit(str(e))
+
+        try:
+            self.model_loaded.emit(load_predictor(self.compact_model))
+        except Exception as e:
+            self.model_failed.emit(str(e))
+
+class TaskSignals(QObject):
+    # Created on the GUI thread, so results emitted from a worker are delivered back on the GUI thread
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class Task(QRunnable):
+    # Runs fn(*args) on a QThreadPool worker and posts the result through its signals
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        # Work that has already started runs to completion, but its result is dropped
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+
+# Messages kept in the chat view; older ones are paged out to a scratch file
+CHAT_LOG_WINDOW = 200
+CHAT_LOG_PAGE_SIZE = 50
+
+
+class ChatLogModel(QAbstractListModel):
+    # Holds a window of the newest messages. Whole pages are written to a scratch file as they
+    # fall out of the window and read back when the user scrolls up to them.
+    SenderRole = Qt.UserRole + 1
+
+    def __init__(self, window=CHAT_LOG_WINDOW, page_size=CHAT_LOG_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.window = max(window, page_size)
+        self.page_size = page_size
+        self.messages = []
+        self.first = 0
+        self.total = 0
+        # Page k holds messages [k * page_size, (k + 1) * page_size) as JSON lines
+        self.spill = tempfile.TemporaryFile()
+        self.page_offsets = []
+
+    def close(self):
+        self.spill.close()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text, sender = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == self.SenderRole:
+            return sender
+        return None
+
+    def append(self, text, sender):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append((text, sender))
+        self.total += 1
+        self.endInsertRows()
+
+    def has_older(self):
+        return self.first > 0
+
+    def trim(self):
+        # Drop whole pages from the top until the window fits again
+        excess = (len(self.messages) - self.window + self.page_size - 1) // self.page_size
+        if excess <= 0:
+            return
+        count = excess * self.page_size
+        for start in range(0, count, self.page_size):
+            page = self.first // self.page_size + start // self.page_size
+            # Pages read back from disk are already stored; only new ones get written
+            if page == len(self.page_offsets):
+                self.write_page(self.messages[start:start + self.page_size])
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self.messages[:count]
+        self.first += count
+        self.endRemoveRows()
+
+    def write_page(self, page):
+        self.spill.seek(0, os.SEEK_END)
+        self.page_offsets.append(self.spill.tell())
+        self.spill.write(b"".join(json.dumps(message).encode('utf-8') + b"\n" for message in page))
+
+    def read_page(self, page):
+        start = self.page_offsets[page]
+        if page + 1 < len(self.page_offsets):
+            end = self.page_offsets[page + 1]
+        else:
+            end = self.spill.seek(0, os.SEEK_END)
+        self.spill.seek(start)
+        return [tuple(json.loads(line)) for line in self.spill.read(end - start).splitlines()]
+
+    def load_older(self):
+        # Bring back the page just above the window; returns how many rows were prepended
+        if not self.has_older():
+            return 0
+        page = self.read_page(self.first // self.page_size - 1)
+        self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+        self.messages[:0] = page
+        self.first -= len(page)
+        self.endInsertRows()
+        return len(page)
+
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    # Paints a message as wrapped plain text; only rows inside the viewport are ever drawn
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log = log
+        self.width = 0
+        self.heights = {}
+
+    def padding(self, option):
+        return QFontMetrics(option.font).lineSpacing() // 2
+
+    def sizeHint(self, option, index):
+        # The view measures every row in its window on each layout, so this stays a dictionary lookup.
+        # Heights are keyed by text; the view clears them when the width or the font changes
+        text = self.log.messages[index.row()][0]
+        height = self.heights.get(text)
+        if height is None:
+            if len(self.heights) > 4 * self.log.window:
+                self.heights.clear()
+            padding = self.padding(option)
+            rect = QFontMetrics(option.font).boundingRect(
+                QRect(0, 0, max(self.width - 2 * padding, 1), 1 << 20), Qt.TextWordWrap, text)
+            height = self.heights[text] = rect.height() + 2 * padding
+        return QSize(self.width, height)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.color(QPalette.HighlightedText))
+        else:
+            painter.setPen(option.palette.color(QPalette.Text))
+        painter.setFont(option.font)
+        padding = self.padding(option)
+        painter.drawText(option.rect.adjusted(padding, padding, -padding, -padding), Qt.TextWordWrap,
+                         self.log.messages[index.row()][0])
+        painter.restore()
+
+
+class ChatLogView(QListView):
+    # Chat history: follows new messages while at the bottom and pages older ones in at the top
+    def __init__(self, window=CHAT_LOG_WINDOW, parent=None):
+        super().__init__(parent)
+        self.log = ChatLogModel(window, parent=self)
+        self.setModel(self.log)
+        self.delegate = ChatMessageDelegate(self.log, self)
+        self.setItemDelegate(self.delegate)
+        self.setWordWrap(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.verticalScrollBar().valueChanged.connect(self.scrolled)
+
+        copy_action = QAction("Copy", self)
+        copy_action.setShortcut(QKeySequence.Copy)
+        copy_action.setShortcutContext(Qt.WidgetShortcut)
+        copy_action.triggered.connect(self.copy_selection)
+        self.addAction(copy_action)
+
+    def resizeEvent(self, event):
+        self.delegate.width = self.viewport().width()
+        self.delegate.heights.clear()
+        super().resizeEvent(event)
+
+    def changeEvent(self, event):
+        if event.type() in (QEvent.FontChange, QEvent.StyleChange):
+            self.delegate.heights.clear()
+        super().changeEvent(event)
+
+    def at_bottom(self):
+        scroll_bar = self.verticalScrollBar()
+        return scroll_bar.value() >= scroll_bar.maximum()
+
+    def append(self, text, sender):
+        following = self.at_bottom()
+        self.log.append(text, sender)
+        # While the user reads older messages nothing is dropped; the window shrinks back once they return
+        if following:
+            self.log.trim()
+            self.scrollToBottom()
+
+    def scrolled(self, value):
+        scroll_bar = self.verticalScrollBar()
+        if value == scroll_bar.minimum() and self.log.has_older():
+            anchor = self.log.index(0)
+            anchor_top = self.visualRect(anchor).top()
+            loaded = self.log.load_older()
+            # Keep the message that was at the top in the same place on screen
+            self.scrollTo(self.log.index(loaded), QAbstractItemView.PositionAtTop)
+            scroll_bar.setValue(scroll_bar.value() - anchor_top)
+        elif value == scroll_bar.maximum():
+            self.log.trim()
+
+    def copy_selection(self):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        QApplication.clipboard().setText("\n".join(self.log.messages[row][0] for row in rows))
+
+
+# ChatbotApp Class Initialisation
+class ChatbotApp(QMainWindow):
+    def __init__(self, startup_report=False, chat_window=CHAT_LOG_WINDOW, compact_model=None):
+        super().__init__()
+        self.startup_report = startup_report
+        self.chat_window = chat_window
+        self.compact_model = compact_model
+        self.startup_timings = {'import': STARTUP_IMPORTED - STARTUP_STARTED}
+        self.initUI()
+        self.is_dark_mode = True
+        self.set_theme()
+
+        # Blocking work (prediction, report files) runs here instead of on the GUI thread
+        self.task_pool = QThreadPool(self)
+        self.pending_tasks = []
+
+        # The window is one client of the session engine and schedules its reminders
+        self.services = HealthServices(HealthRecordStore())
+        self.session = ChatSession(self.services, scheduler=self)
+
+        # One timer drives the reminders of whoever is logged in; nobody's until someone logs in.
+        # A kiosk is shared, so other patients' reminders never show here
+        self.reminders = ReminderScheduler(patient=None)
+        self.reminder_timer = QTimer(self)
+        self.reminder_timer.setSingleShot(True)
+        self.reminder_timer.timeout.connect(self.fire_reminders)
+
+        # Advice and the model arrive from the startup thread; health features wait for them
+        self.startup_loader = StartupLoader(self.compact_model, self)
+        self.startup_loader.advice_loaded.connect(self.load_medical_advice)
+        self.startup_loader.advice_failed.connect(self.medical_advice_failed)
+        self.startup_loader.model_loaded.connect(self.model_ready)
+        self.startup_loader.model_failed.connect(self.model_failed)
+        self.startup_loader.start()
+
+        # Fires on the first pass of the event loop, i.e. once the window can take input
+        QTimer.singleShot(0, self.ui_ready)
+
+    def initUI(self):
+        self.setWindowTitle("Health Buddy AI Virtual Assistant")
+        self.setWindowIcon(QIcon("HealthBuddyLogo.jpeg"))  # logo image path
+
+
+
+        monospace_font = QFont("Courier New", 15)
+        monospace_font_chathistory = QFont("Courier New")
+        monospace_font_chathistory.setPixelSize(25)
+
+        # Only the newest messages stay in memory; older ones are paged back in on scroll
+        self.chat_history = ChatLogView(self.chat_window, self)
+
+        self.chat_history.setFont(monospace_font_chathistory)
+
+        self.user_input = QLineEdit(self)
+        self.user_input.setPlaceholderText("Type your message here...")
+
+
+        self.user_input.setFont(monospace_font)
+        self.user_input.returnPressed.connect(self.handle_input)
+
+        self.send_button = QPushButton("Send", self)
+
+
+        self.send_button.setFont(monospace_font)
+        self.send_button.clicked.connect(self.handle_input)
+
+        input_layout = QHBoxLayout()
+        input_layout.addWidget(self.user_input)
+        input_layout.addWidget(self.send_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.chat_history)
+        layout.addLayout(input_layout)
+
+        container = QWidget()
+        container.setLayout(layout)
+        self.setCentralWidget(container)
+
+        # Shown while predictions and report I/O run on the worker pool
+        self.thinking_label = QLabel("Bot is thinking…", self)
+        self.thinking_label.setFont(monospace_font)
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.setFont(monospace_font)
+        self.cancel_button.clicked.connect(self.cancel_tasks)
+        self.thinking_label.hide()
+        self.cancel_button.hide()
+        input_layout.insertWidget(0, self.thinking_label)
+        input_layout.addWidget(self.cancel_button)
+
+        # Menu bar for Future Updates
+        """menubar = self.menuBar()
+        viewMenu = menubar.addMenu('View')"""
+
+        # Ctrl+Shift+P starts and stops a cProfile capture of the GUI thread
+        profileAction = QAction('Toggle Profiler', self)
+        profileAction.setShortcut(QKeySequence('Ctrl+Shift+P'))
+        profileAction.triggered.connect(self.toggle_profiler)
+        self.addAction(profileAction)
+
+        toggleThemeAction = QAction('Toggle Theme', self)
+        toggleThemeAction.triggered.connect(self.toggle_theme)
+        #viewMenu.addAction(toggleThemeAction)
+
+        self.append_message(f"Bot: {GREETING}", "bot")
+        self.showMaximized()
+
+    def closeEvent(self, event):
+        # Let a model that is still loading, and any running task, finish before Qt tears the threads down
+        self.startup_loader.wait()
+        self.cancel_tasks()
+        self.task_pool.waitForDone()
+        self.chat_history.log.close()
+        super().closeEvent(event)
+
+    def set_theme(self):
+        if self.is_dark_mode:
+            self.setStyleSheet("""
+                QMainWindow {background-color: #1e1e1e;}
+                QListView {background-color: #1e1e1e;color: #ffffff;}
+                QLineEdit {background-color: #333333;color: #ffffff;}
+                QPushButton {background-color: #333333;color: #ffffff;}""")
+        else:
+            self.setStyleSheet("""
+                QMainWindow {background-color: #ffffff;}
+                QListView {background-color: #ffffff;color: #000000;}
+                QLineEdit {background-color: #f0f0f0color: #000000;}
+                QPushButton {background-color: #f0f0f0;color: #000000;}""")
+
+    def toggle_theme(self):
+        # Toggle Theme for Dark Mode
+        self.is_dark_mode = not self.is_dark_mode
+        self.set_theme()
+    def toggle_profiler(self):
+        if METRICS.profiler is None:
+            METRICS.start_profiler()
+            self.append_message("Bot: Profiling started. Press Ctrl+Shift+P again to stop.", "bot")
+            return
+        path = os.path.abspath(time.strftime('healthbuddy-%Y%m%d-%H%M%S.prof'))
+        METRICS.stop_profiler(path)
+        self.append_message(f"Bot: Profile saved to {path} (open it with python -m pstats).", "bot")
+
+    def ui_ready(self):
+        self.startup_timings['ui_ready'] = time.perf_counter() - STARTUP_STARTED
+
+    def load_medical_advice(self, advice_index):
+        # The advice index is opened, or rebuilt from the CSV files, by the startup thread
+        self.services.advice_index = advice_index
+        self.services.advice_ready.set()
+
+    def medical_advice_failed(self, error):
+        self.services.advice_ready.set()
+        QMessageBox.critical(self, 'Error', f"Failed to load medical advice: {error}")
+
+    def model_ready(self, predictor):
+        self.services.predictor = predictor
+        self.startup_timings['model_ready'] = time.perf_counter() - STARTUP_STARTED
+        if self.startup_report:
+            print(json.dumps(self.startup_timings), flush=True)
+            self.quit_after_startup()
+
+    def quit_after_startup(self):
+        # The loader may already have finished by the time this slot runs
+        self.startup_loader.finished.connect(QApplication.quit)
+        if self.startup_loader.isFinished():
+            QApplication.quit()
+
+    def model_failed(self, error):
+        if self.startup_report:
+            print(json.dumps({'error': error}), flush=True)
+            self.quit_after_startup()
+            return
+        QMessageBox.critical(self, 'Error', f"Failed to load the health prediction model: {error}")
+
+    def handle_input(self):
+        user_message = self.user_input.text().strip()
+        if user_message:
+            self.append_message(f"User: {user_message}", "user")
+            self.user_input.clear()
+
+            bot_response = self.get_bot_response(user_message)
+            # None means the reply will be posted when a background task finishes
+            if bot_response is not None:
+                self.append_message(f"Bot: {bot_response}", "bot")
+
+    def run_task(self, fn, *args, on_done):
+        # on_done(result) builds the bot reply on the GUI thread once fn(*args) returns on the pool
+        task = Task(fn, *args)
+        task.signals.finished.connect(lambda result: self.task_done(task, lambda: on_done(result)))
+        task.signals.failed.connect(lambda error: self.task_done(task, lambda: f"Sorry, something went wrong: {error}"))
+        self.pending_tasks.append(task)
+        self.update_thinking()
+        self.task_pool.start(task)
+        return task
+
+    def task_done(self, task, make_reply):
+        # A cancelled task's signal may already be queued; its result must not change the session or reach the chat
+        if task.cancelled or task not in self.pending_tasks:
+            return
+        self.pending_tasks.remove(task)
+        self.update_thinking()
+        self.append_message(f"Bot: {make_reply()}", "bot")
+
+    def cancel_tasks(self):
+        for task in self.pending_tasks:
+            task.cancel()
+            self.task_pool.tryTake(task)
+        had_tasks = bool(self.pending_tasks)
+        self.pending_tasks = []
+        self.update_thinking()
+        return had_tasks
+
+    def update_thinking(self):
+        busy = bool(self.pending_tasks)
+        self.thinking_label.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+
+    def append_message(self, message, sender):
+        self.chat_history.append(message, sender)
+
+    def get_bot_response(self, message):
+        # Stop waiting for whatever is still running in the background
+        if message.lower().strip() == "cancel" and self.pending_tasks:
+            self.cancel_tasks()
+            return "Okay, I've cancelled that."
+
+        patient = self.session.patient_name
+        reply = self.session.handle(message)
+        if self.session.patient_name != patient:
+            self.patient_changed()
+        if self.session.closed:
+            QTimer.singleShot(0, self.close)
+        if isinstance(reply, Deferred):
+            self.run_task(reply.fn, *reply.args, on_done=reply.finish)
+            return None
+        return reply
+
+    def schedule_reminder(self, patient, med_name, reminder_time, repeat):
+        first_fire = time.time() + next_reminder_delay(reminder_time)
+        self.reminders.add(patient, 'medicine', med_name, first_fire, repeat)
+        self.arm_reminder_timer()
+
+    def schedule_appointment(self, patient, doctor, time_str):
+        first_fire = time.time() + next_appointment_delay(time_str)
+        self.reminders.add(patient, 'appointment', doctor, first_fire)
+        self.arm_reminder_timer()
+
+    def arm_reminder_timer(self):
+        # Wake up for the earliest reminder only; long waits are split so the millisecond interval cannot overflow
+        delay = self.reminders.next_delay()
+        if delay is None:
+            self.reminder_timer.stop()
+        else:
+            self.reminder_timer.start(int(min(delay, 86400) * 1000))
+
+    def patient_changed(self):
+        # Load the reminders of the patient who just logged in (none after logging out), then catch up
+        # on what they missed, including reminders the chat service held while they were away
+        patient = self.session.patient_name
+        self.reminders.scope(patient)
+        self.fire_reminders(self.reminders.take_held(patient) if patient else [])
+
+    def fire_reminders(self, held=()):
+        missed = list(held)
+        for reminder, was_missed in self.reminders.due():
+            if was_missed:
+                missed.append((reminder['next_fire'], reminder_text(reminder)))
+            elif reminder['kind'] == 'appointment':
+                self.show_appointment_reminder(reminder['label'])
+            else:
+                self.show_reminder_popup(reminder['label'])
+        if missed:
+            lines = "\n".join(f"{datetime.fromtimestamp(fired_at).strftime('%Y-%m-%d %H:%M')}: {text}"
+                              for fired_at, text in sorted(missed))
+            self.append_message(f"Bot: Reminders you missed while you were away:\n{lines}", "bot")
+        self.arm_reminder_timer()
+
+    def show_reminder_popup(self, med_name):
+        QMessageBox.information(self, 'Medicine Reminder', f"Time to take your medicine: {med_name}")
+
+    def show_appointment_reminder(self, doctor):
+        QMessageBox.information(self, 'Appointment Reminder', f"You have an appointment with Dr. {doctor}.")
+
+
+def predict_file(input_path, output_path, chunk_size=10000):
+    # Stream intake records from a CSV and append predictions chunk by chunk
+    predictor = HealthPredictor(DATASET_PATH)
+    total = 0
+    header = True
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='') as output:
+            for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+                predictions = predictor.predict_many(chunk, chunk_size)
+                pd.concat([chunk, predictions], axis=1).to_csv(output, header=header, index=False)
+                header = False
+                total += len(chunk)
+            if header:
+                # A header-only CSV can come through without any chunk; the output still gets its columns
+                predictions = predictor.predict_many(pd.DataFrame(columns=FEATURE_COLUMNS))
+                pd.DataFrame(columns=FEATURE_COLUMNS + list(predictions.columns)).to_csv(output, index=False)
+    except pd.errors.EmptyDataError:
+        os.remove(tmp_path)
+        raise ValueError(f"{input_path} is empty; expected a header row with {', '.join(FEATURE_COLUMNS)}")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return total
+
+
+# Report export: checks shown per patient, patients read from the store at a time, pages per worker task
+REPORT_HISTORY = 10
+EXPORT_READ_BATCH = 1000
+EXPORT_RENDER_BATCH = 250
+
+
+def report_file_name(patient):
+    # Readable and unique even for names that differ only in characters a file name cannot hold
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', patient).strip('_')[:40] or 'patient'
+    return f"{slug}-{hashlib.blake2b(patient.encode('utf-8'), digest_size=5).hexdigest()}.html"
+
+
+def write_report_pages(output_dir, reports):
+    # Runs in an export worker process. Each page is written to a temporary file and renamed, so an
+    # interrupted export never leaves half a page behind. Returns (patient, signature, file name) per page
+    written = []
+    for report in reports:
+        name = report_file_name(report['patient'])
+        path = os.path.join(output_dir, name)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            file.write(render_report_html(report))
+        os.replace(f"{path}.tmp", path)
+        written.append((report['patient'], report['signature'], name))
+    return written
+
+
+class ReportExporter:
+    # Nightly batch of HTML health reports: one page per patient plus index.html in output_dir.
+    # Patients are read from the record store read_batch at a time and their latest checks are scored
+    # with one predict_many call per batch; pages are rendered by a process pool with at most max_pending
+    # tasks in flight, so memory stays flat however many patients there are. manifest.db in output_dir
+    # records what each page was built from: a page is rebuilt only when the patient has new checks or the
+    # model changed, and an export that was stopped picks up where it left off.
+    def __init__(self, record_store, predictor, output_dir, workers=None, history=REPORT_HISTORY,
+                 read_batch=EXPORT_READ_BATCH, render_batch=EXPORT_RENDER_BATCH, max_pending=None):
+        self.record_store = record_store
+        self.predictor = predictor
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count()
+        self.history = history
+        self.read_batch = read_batch
+        self.render_batch = render_batch
+        self.max_pending = max_pending or 2 * self.workers
+        # Models saved before artifacts carried an id are told apart by their pickled bytes
+        artifact = predictor.artifact
+        self.model_version = artifact.get('model_id') or hashlib.sha256(pickle.dumps(artifact['model'])).hexdigest()[:32]
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = sqlite3.connect(os.path.join(output_dir, 'manifest.db'))
+        with self.manifest:
+            self.manifest.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    patient TEXT PRIMARY KEY,
+                    signature TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    exported_at TEXT NOT NULL
+                )""")
+
+    def stale_reports(self, stats, limit=None):
+        # Yields lists of at most render_batch reports whose pages are missing or out of date
+        for histories in self.record_store.iter_histories(self.read_batch, self.history):
+            patients = [patient for patient, _, _, _, _ in histories]
+            exported = dict(self.manifest.execute(
+                f"SELECT patient, signature FROM pages WHERE patient IN ({', '.join('?' * len(patients))})", patients))
+            stale = []
+            for patient, latest, history, total, newest in histories:
+                signature = f"{newest}:{total}:{self.model_version}"
+                if exported.get(patient) == signature:
+                    stats['current'] += 1
+                elif limit is None or stats['queued'] < limit:
+                    stale.append({'patient': patient, 'latest': latest, 'history': history, 'total': total,
+                                  'signature': signature})
+                    stats['queued'] += 1
+            if stale:
+                predictions = self.predictor.predict_many([check_features(report['latest']['answers'])
+                                                           for report in stale])
+                for report, (disease, confidence, advice) in zip(stale, predictions.itertuples(index=False)):
+                    report['assessment'] = {'disease': disease, 'confidence': float(confidence), 'advice': advice}
+                for start in range(0, len(stale), self.render_batch):
+                    yield stale[start:start + self.render_batch]
+            if limit is not None and stats['queued'] >= limit:
+                return
+
+    def record(self, done, stats):
+        # Pages are recorded only after their worker has written them
+        exported_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.manifest:
+            for future in done:
+                written = future.result()
+                self.manifest.executemany(
+                    "INSERT OR REPLACE INTO pages (patient, signature, file, exported_at) VALUES (?, ?, ?, ?)",
+                    ((patient, signature, name, exported_at) for patient, signature, name in written))
+                stats['rendered'] += len(written)
+
+    def run(self, limit=None):
+        # Renders every missing or outdated page (at most limit of them) and rewrites index.html.
+        # Returns {'rendered': pages written, 'current': pages already up to date, 'queued': pages scheduled}
+        stats = {'rendered': 0, 'current': 0, 'queued': 0}
+        pending = set()
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            try:
+                for reports in self.stale_reports(stats, limit):
+                    if len(pending) >= self.max_pending:
+                        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        self.record(done, stats)
+                    pending.add(executor.submit(write_report_pages, self.output_dir, reports))
+                done, pending = concurrent.futures.wait(pending)
+                self.record(done, stats)
+            except BaseException:
+                # Keep whatever finished so the next run resumes from there; the rest is redone then
+                for future in pending:
+                    future.cancel()
+                done, _ = concurrent.futures.wait(pending)
+                self.record([future for future in done if not future.cancelled() and future.exception() is None], stats)
+                raise
+        self.write_index()
+        return stats
+
+    def write_index(self):
+        path = os.path.join(self.output_dir, 'index.html')
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            file.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Health Reports</title>'
+                       f"<style>{REPORT_STYLE}</style></head><body>\n<h1>Health Reports</h1>\n"
+                       "<table><tr><th>Patient</th><th>Exported</th></tr>\n")
+            for patient, name, exported_at in self.manifest.execute(
+                    "SELECT patient, file, exported_at FROM pages ORDER BY patient"):
+                file.write(f'<tr><td><a href="{html.escape(name)}">{html.escape(patient)}</a></td>'
+                           f"<td>{exported_at}</td></tr>\n")
+            file.write("</table></body></html>\n")
+        os.replace(f"{path}.tmp", path)
+
+
+class ChatServer:
+    # Hosts one ChatSession per connection over newline-delimited JSON.
+    # Client -> server: {"message": "..."}; server -> client: {"reply": "..."} or {"notification": "..."}
+    def __init__(self, services, reminders, max_workers=8):
+        self.services = services
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.sessions = {}
+
+        # One event-loop timer drives the reminders of every session; they are pushed to whoever is logged in
+        self.reminders = reminders
+        self.reminder_handle = None
+        self.arm_reminder_timer()
+
+    def schedule_reminder(self, patient, med_name, reminder_time, repeat):
+        self.reminders.add(patient, 'medicine', med_name, time.time() + next_reminder_delay(reminder_time), repeat)
+        self.arm_reminder_timer()
+
+    def schedule_appointment(self, patient, doctor, time_str):
+        self.reminders.add(patient, 'appointment', doctor, time.time() + next_appointment_delay(time_str))
+        self.arm_reminder_timer()
+
+    def arm_reminder_timer(self):
+        if self.reminder_handle is not None:
+            self.reminder_handle.cancel()
+        delay = self.reminders.next_delay()
+        self.reminder_handle = None if delay is None else asyncio.get_running_loop().call_later(delay, self.fire_reminders)
+
+    def fire_reminders(self):
+        for reminder, missed in self.reminders.due():
+            text = reminder_text(reminder)
+            delivered = False
+            for session, send in self.sessions.values():
+                if session.patient_name == reminder['patient']:
+                    send({'notification': f"Missed reminder: {text}" if missed else text})
+                    delivered = True
+            if not delivered:
+                # Nobody to tell right now: hand it over when the patient next logs in
+                self.reminders.hold(reminder, text)
+        self.arm_reminder_timer()
+
+    def deliver_held_reminders(self, patient, send):
+        held = self.reminders.take_held(patient)
+        if held:
+            lines = "\n".join(f"{datetime.fromtimestamp(fired_at).strftime('%Y-%m-%d %H:%M')}: {text}"
+                              for fired_at, text in held)
+            send({'notification': f"Reminders you missed while you were away:\n{lines}"})
+
+    async def handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        session_id = uuid.uuid4().hex
+
+        def send(payload):
+            writer.write((json.dumps(payload) + "\n").encode())
+
+        session = ChatSession(self.services, scheduler=self)
+        self.sessions[session_id] = (session, send)
+        try:
+            send({'session': session_id, 'reply': GREETING})
+            await writer.drain()
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)['message']
+                except (ValueError, KeyError, TypeError):
+                    send({'error': 'Expected a JSON line like {"message": "hello"}'})
+                    continue
+
+                patient = session.patient_name
+                reply = session.handle(str(message))
+                if isinstance(reply, Deferred):
+                    # Prediction and report I/O run on the thread pool so other sessions keep flowing
+                    try:
+                        result = await loop.run_in_executor(self.executor, reply.fn, *reply.args)
+                        reply = reply.finish(result)
+                    except Exception as e:
+                        reply = f"Sorry, something went wrong: {e}"
+                send({'reply': reply})
+                if session.patient_name and session.patient_name != patient:
+                    self.deliver_held_reminders(session.patient_name, send)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session_id]
+            writer.close()
+
+
+# Histogram bucket bounds in seconds: four per decade from 1 us to 100 s
+LATENCY_BUCKETS = tuple(10 ** (exponent / 4 - 6) for exponent in range(33))
+HISTOGRAM_BATCH = 8192
+METRICS_PREFIX = 'healthbuddy'
+
+
+class Histogram:
+    # Prometheus-style cumulative-bucket histogram; percentiles are interpolated within a bucket.
+    # Observations queue up on a deque (append is atomic) and are bucketed in bulk on read, or every
+    # HISTOGRAM_BATCH samples, so recording one costs an append instead of a lock and a search
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        self.pending.append(value)
+        if len(self.pending) >= HISTOGRAM_BATCH:
+            self.fold()
+
+    def fold(self):
+        with self.lock:
+            waiting = len(self.pending)
+            if not waiting:
+                return
+            values = np.fromiter((self.pending.popleft() for _ in range(waiting)), dtype=np.float64, count=waiting)
+            slots = np.bincount(np.searchsorted(self.buckets, values, side='left'), minlength=len(self.counts))
+            self.counts = [total + int(added) for total, added in zip(self.counts, slots)]
+            self.count += waiting
+            self.total += float(values.sum())
+            self.max = max(self.max, float(values.max()))
+
+    def quantile(self, fraction):
+        self.fold()
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for slot, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[slot - 1] if slot else 0.0
+                upper = min(self.buckets[slot], self.max) if slot < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class Metrics:
+    # Timers, counters and latency histograms for the chat and prediction pipeline. Nothing is measured
+    # until install() wraps the functions in INSTRUMENTED_STAGES, so with metrics off the originals run untouched.
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.installed = []
+        self.profiler = None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def timed(self, name, fn):
+        histogram = self.histogram(name)
+
+        @functools.wraps(fn)
+        def timer(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                self.count(f'{name}_errors')
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return timer
+
+    def install(self, stages=None):
+        if self.enabled:
+            return
+        for name, owner, attribute in stages or INSTRUMENTED_STAGES:
+            original = owner.__dict__[attribute]
+            wrapped = self.timed(name, original)
+            if attribute == 'due':
+                wrapped = reminder_lateness(self, wrapped)
+            self.installed.append((owner, attribute, original))
+            setattr(owner, attribute, wrapped)
+        self.enabled = True
+
+    def uninstall(self):
+        for owner, attribute, original in reversed(self.installed):
+            setattr(owner, attribute, original)
+        self.installed = []
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def start_profiler(self):
+        # cProfile sees the thread that starts it: the GUI thread, or the event loop of the chat service
+        import cProfile
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profiler(self, path=None):
+        # Returns the pstats.Stats of the capture, also written to path when given
+        import pstats
+        if self.profiler is None:
+            return None
+        self.profiler.disable()
+        profiler, self.profiler = self.profiler, None
+        if path:
+            profiler.dump_stats(path)
+        return pstats.Stats(profiler)
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        for name, histogram in sorted(histograms.items()):
+            family = f"{METRICS_PREFIX}_{name}_seconds"
+            histogram.fold()
+            with histogram.lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.total
+            lines.append(f"# TYPE {family} histogram")
+            cumulative = 0
+            for bound, bucket in zip(histogram.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{family}_bucket{{le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{family}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{family}_sum {total:.9f}")
+            lines.append(f"{family}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Atomic, so a node_exporter textfile collector never reads half a file
+        scratch = f"{path}.{os.getpid()}.tmp"
+        with open(scratch, 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(scratch, path)
+
+    def report(self, file=None, stats=None, top=25):
+        # Per-stage summary, slowest total first, then the busiest functions of a cProfile capture
+        file = file or sys.stdout
+        print(f"{'stage':28s} {'calls':>8s} {'total s':>9s} {'mean ms':>9s} {'p50 ms':>9s} "
+              f"{'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}", file=file)
+        for histogram in list(self.histograms.values()):
+            histogram.fold()
+        for name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            if histogram.count:
+                print(f"{name:28s} {histogram.count:8d} {histogram.total:9.3f} "
+                      f"{histogram.total * 1000 / histogram.count:9.3f} {histogram.quantile(0.5) * 1000:9.3f} "
+                      f"{histogram.quantile(0.95) * 1000:9.3f} {histogram.quantile(0.99) * 1000:9.3f} "
+                      f"{histogram.max * 1000:9.3f}", file=file)
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:28s} {value:8d}", file=file)
+        if stats is not None:
+            print(file=file)
+            stats.stream = file
+            stats.sort_stats('cumulative').print_stats(top)
+
+
+def reminder_lateness(metrics, due):
+    # Around ReminderScheduler.due: how late each on-time reminder fired, i.e. the timer drift
+    @functools.wraps(due)
+    def lateness(scheduler):
+        fired = due(scheduler)
+        now = scheduler.clock()
+        for reminder, missed in fired:
+            if missed:
+                metrics.count('reminders_missed')
+            else:
+                metrics.observe('reminder_lateness', now - reminder['next_fire'])
+        if fired:
+            metrics.count('reminders_fired', len(fired))
+        return fired
+    return lateness
+
+
+METRICS = Metrics()
+
+# (metric, owner, attribute) for every timed stage; module-level functions are patched on the module
+INSTRUMENTED_STAGES = [
+    ('gui_reply', ChatbotApp, 'get_bot_response'),
+    ('chat_append', ChatLogView, 'append'),
+    ('chat_size_hint', ChatMessageDelegate, 'sizeHint'),
+    ('chat_paint', ChatMessageDelegate, 'paint'),
+    ('background_task', Task, 'run'),
+    ('session_reply', ChatSession, 'handle'),
+    ('intent_match', IntentMatcher, 'match'),
+    ('login_check', HealthServices, 'check_existing_patient'),
+    ('health_check_answer', ChatSession, 'handle_health_check'),
+    ('health_check_save', HealthServices, 'save_health_data'),
+    ('report_read', HealthServices, 'view_health_report'),
+    ('history_read', HealthServices, 'view_health_history'),
+    ('record_write', HealthRecordStore, 'add_check'),
+    ('report_render', sys.modules[__name__], 'render_report'),
+    ('advice_index_load', sys.modules[__name__], 'load_advice_index'),
+    ('advice_search', AdviceIndex, 'search'),
+    ('daily_tip', HealthServices, 'daily_medical_advice'),
+    ('model_load', sys.modules[__name__], 'load_predictor'),
+    ('model_train', ModelTrainer, 'run'),
+    ('model_update', ModelUpdater, 'update'),
+    ('prediction_table_build', PredictionTable, '__init__'),
+    ('predict_disease', HealthPredictor, 'predict_disease'),
+    ('predict_disease_compact', CompactForest, 'predict_disease'),
+    ('predict_batch', HealthPredictor, 'classify'),
+    ('predict_batch_compact', CompactForest, 'classify'),
+    ('reminder_check', ReminderScheduler, 'due'),
+]
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    # Prometheus scrape endpoint at http://host:port/metrics on a daemon thread
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = METRICS.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def export_metrics_file(path, interval=15.0):
+    # Rewrites the Prometheus text file every interval seconds, and once more at exit
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            METRICS.write_prometheus(path)
+
+    threading.Thread(target=run, name='metrics-file', daemon=True).start()
+    atexit.register(lambda: (stop.set(), METRICS.write_prometheus(path)))
+    return stop
+
+
+def raise_open_file_limit():
+    # Every concurrent session holds a socket, so lift the soft descriptor limit as far as allowed
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+async def serve_chat(host, port, db_path, compact_model=None):
+    loop = asyncio.get_running_loop()
+    services = HealthServices(HealthRecordStore(db_path))
+    services.advice_index = await loop.run_in_executor(None, load_advice_index)
+    services.advice_ready.set()
+    services.predictor = await loop.run_in_executor(None, load_predictor, compact_model)
+
+    chat_server = ChatServer(services, ReminderScheduler(db_path))
+    server = await asyncio.start_server(chat_server.handle_connection, host, port, backlog=4096)
+    bound_port = server.sockets[0].getsockname()[1]
+    print(f"Health Buddy chat service listening on {host}:{bound_port}", flush=True)
+    # SIGTERM stops the service like Ctrl+C, so exit handlers (--profile, --metrics-file) still run
+    try:
+        loop.add_signal_handler(signal.SIGTERM, server.close)
+    except (NotImplementedError, AttributeError):
+        pass
+    async with server:
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+
+def load_test_name(index):
+    # Patient names may only contain letters, so spell the session number in letters
+    letters = ''
+    index += 1
+    while index:
+        index, digit = divmod(index - 1, 26)
+        letters = chr(ord('a') + digit) + letters
+    return f"Load {letters}"
+
+
+async def run_load_test(host, port, sessions):
+    # Every session logs in, completes a health check, reads its report and a tip, then exits
+    latencies = []
+
+    async def converse(index):
+        reader, writer = await asyncio.open_connection(host, port)
+        await reader.readline()
+        script = ["hi", "login", load_test_name(index), "health check", "fine",
+                  "yes", "no", "yes", "no", str(20 + index % 60), "female", "normal", "high",
+                  "view health report", "daily medical advice", "exit"]
+        for message in script:
+            started = time.perf_counter()
+            writer.write((json.dumps({'message': message}) + "\n").encode())
+            await writer.drain()
+            while True:
+                payload = json.loads(await reader.readline())
+                if 'reply' in payload or 'error' in payload:
+                    break
+            latencies.append(time.perf_counter() - started)
+        writer.close()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[converse(index) for index in range(sessions)], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = [result for result in results if isinstance(result, Exception)]
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    print(f"{sessions} concurrent sessions, {len(latencies)} messages in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} msg/s), {len(failures)} failed sessions")
+    print(f"reply latency p50 {percentile(latencies_ms, 0.5):.1f} ms   p95 {percentile(latencies_ms, 0.95):.1f} ms   "
+          f"p99 {percentile(latencies_ms, 0.99):.1f} ms   max {max(latencies_ms, default=0):.1f} ms")
+    if failures:
+        print(f"first failure: {failures[0]!r}")
+    return not failures
+
+
+def load_test(host, port, sessions):
+    # Without a port, start a throwaway server (with its own record store) in a child process
+    raise_open_file_limit()
+    if port:
+        return asyncio.run(run_load_test(host, port, sessions))
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--host', host,
+                                   '--port', '0', '--db', os.path.join(scratch_dir, 'load_test.db')],
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            banner = server.stdout.readline()
+            match = re.search(r":(\d+)$", banner.strip())
+            if not match:
+                raise RuntimeError(f"Chat service failed to start: {banner!r}")
+            return asyncio.run(run_load_test(host, int(match.group(1)), sessions))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def benchmark_record_store(records, patients, queries):
+    # Bulk-load synthetic checks, then time the lookups the chat uses
+    answers = {'day': 'fine', 'Fever': 'yes', 'Cough': 'no', 'Fatigue': 'yes', 'Difficulty Breathing': 'no',
+               'Age': 42, 'Gender': 'female', 'Blood Pressure': 'normal', 'Cholesterol Level': 'high'}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        store = HealthRecordStore(os.path.join(scratch_dir, 'bench.db'))
+        started = time.perf_counter()
+        batch_size = 50000
+        for start in range(0, records, batch_size):
+            store.add_checks(
+                (f"Patient {index % patients}", f"2024-01-01 00:00:{index % 60:02d}", answers, 'Asthma', 'use inhalers as prescribed.')
+                for index in range(start, min(start + batch_size, records)))
+        elapsed = time.perf_counter() - started
+        size_mb = sum(os.path.getsize(path) for path in glob.glob(os.path.join(scratch_dir, 'bench.db*'))) / 1e6
+        print(f"inserted {records} checks for {patients} patients in {elapsed:.2f}s "
+              f"({records / elapsed:.0f} rows/s), {size_mb:.1f} MB on disk")
+
+        rng = random.Random(0)
+        names = [f"Patient {rng.randrange(patients)}" for _ in range(queries)]
+        for label, query in [('has_patient', store.has_patient),
+                             ('latest_check', store.latest_check),
+                             ('history page', lambda name: store.history(name, 10, 0)),
+                             ('single insert', lambda name: store.add_check(name, answers, 'Asthma', 'rest.'))]:
+            timings = []
+            for name in names:
+                started = time.perf_counter()
+                query(name)
+                timings.append((time.perf_counter() - started) * 1e6)
+            print(f"{label:14s} p50 {percentile(timings, 0.5):8.1f} us   p99 {percentile(timings, 0.99):8.1f} us")
+        store.close()
+
+
+class SimulatedClock:
+    # Stands in for time.time so scheduler checks can jump through days instantly
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def benchmark_scheduler(count, days):
+    # Drive a ReminderScheduler with a simulated clock: every reminder must fire on schedule,
+    # a restart must catch up on what was missed, and timer work must not grow with the reminder count
+    rng = random.Random(0)
+    failures = 0
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        path = os.path.join(scratch_dir, 'reminders.db')
+        start = datetime(2024, 1, 1).timestamp()
+        clock = SimulatedClock(start)
+        scheduler = ReminderScheduler(path, clock)
+
+        repeats = ['once', 'daily', 'weekly']
+        expected = {}
+        started = time.perf_counter()
+        for index in range(count):
+            repeat = repeats[index % 3]
+            first_fire = start + rng.randrange(1, 86400)
+            reminder_id = scheduler.add(f"Patient {index}", 'medicine', f"Medicine {index}", first_fire, repeat)
+            expected[reminder_id] = (first_fire, repeat)
+        add_elapsed = time.perf_counter() - started
+        print(f"added {count} reminders in {add_elapsed:.2f}s ({add_elapsed / count * 1e6:.1f} us each)")
+
+        # Step the clock one minute at a time, as the single timer would
+        fired_counts = {}
+        wakeups = 0
+        due_elapsed = 0.0
+        for _ in range(days * 24 * 60):
+            clock.advance(60)
+            if scheduler.next_delay() == 0:
+                wakeups += 1
+                started = time.perf_counter()
+                for reminder, missed in scheduler.due():
+                    fired_counts[reminder['id']] = fired_counts.get(reminder['id'], 0) + 1
+                    failures += missed
+                due_elapsed += time.perf_counter() - started
+        fired = sum(fired_counts.values())
+        print(f"simulated {days} days: {fired} reminders fired over {wakeups} timer wake-ups, "
+              f"{due_elapsed / max(fired, 1) * 1e6:.1f} us per fired reminder")
+
+        for reminder_id, (first_fire, repeat) in expected.items():
+            occurrences = (clock.now - first_fire) // 86400 + 1
+            want = 1 if repeat == 'once' else occurrences if repeat == 'daily' else (occurrences + 6) // 7
+            if fired_counts.get(reminder_id, 0) != want:
+                failures += 1
+
+        # Close, stay away for three days, reopen: each active reminder fires exactly once, flagged missed
+        scheduler.close()
+        clock.advance(3 * 86400)
+        started = time.perf_counter()
+        scheduler = ReminderScheduler(path, clock)
+        overdue = sum(1 for reminder in scheduler.reminders.values() if reminder['next_fire'] <= clock.now)
+        caught_up = scheduler.due()
+        reload_elapsed = time.perf_counter() - started
+        if not overdue or len(caught_up) != overdue or not all(missed for _, missed in caught_up):
+            failures += 1
+        if scheduler.next_delay() is None or scheduler.next_delay() > 86400:
+            failures += 1
+        print(f"restart after 3 days: reloaded and caught up {len(caught_up)} missed reminders in {reload_elapsed:.2f}s")
+        scheduler.close()
+
+        # A kiosk and the chat service on the same database: the kiosk, scoped to the patient logged in,
+        # sees only their reminders, and every reminder fires in exactly one of the two
+        service = ReminderScheduler(path, clock)
+        kiosk = ReminderScheduler(path, clock, patient=None)
+        for index in range(10):
+            service.add('Kiosk Patient' if index % 2 else 'Someone Else', 'medicine', f"Shared {index}",
+                        clock.now + 60 + index, 'daily')
+        kiosk.scope('Kiosk Patient')
+        clock.advance(120)
+        on_kiosk = [reminder for reminder, _ in kiosk.due() if reminder['label'].startswith('Shared')]
+        on_service = [reminder for reminder, _ in service.due() if reminder['label'].startswith('Shared')]
+        kiosk_ids = {reminder['id'] for reminder in on_kiosk}
+        service_ids = {reminder['id'] for reminder in on_service}
+        if (len(on_kiosk) != 5 or any(reminder['patient'] != 'Kiosk Patient' for reminder in on_kiosk)
+                or kiosk_ids & service_ids or len(kiosk_ids | service_ids) != 10):
+            failures += 1
+        print(f"kiosk and chat service sharing the database: {len(on_kiosk)} fired on the kiosk, "
+              f"{len(on_service)} on the service, {len(kiosk_ids & service_ids)} on both")
+        service.close()
+        kiosk.close()
+
+    print("scheduler check passed" if not failures else f"scheduler check FAILED ({failures} problems)")
+    return failures == 0
+
+
+def current_rss_mb():
+    # Resident set size right now; falls back to the peak where /proc is not available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def benchmark_chat_log(messages, window, compare):
+    # Append messages one by one through the chat view, letting Qt lay out and paint after each,
+    # and report how append latency and memory develop as the conversation grows
+    app = QApplication.instance() or QApplication(sys.argv)
+    lines = [
+        "Bot: Here's a piece of medical advice for you:\n\nStay hydrated and get enough sleep.",
+        "User: view health report",
+        "Bot: Enter the reminder time (HH:MM)⏰:",
+        "User: I have had a mild fever and a cough since yesterday, should I be worried about it?",
+    ]
+
+    def legacy_append(view, message):
+        # The QTextEdit append that the chat used before the list view
+        cursor = view.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertHtml(f'<div style="text-align: left; color: white; font-size: 25px;">{message}</div><br>')
+        view.setTextCursor(cursor)
+        view.ensureCursorVisible()
+
+    def run(label, view, append, count):
+        view.resize(900, 700)
+        view.show()
+        app.processEvents()
+        rss_before = current_rss_mb()
+        timings = []
+        checkpoint = max(count // 5, 1)
+        for index in range(count):
+            started = time.perf_counter()
+            append(view, f"{lines[index % len(lines)]} #{index}")
+            app.processEvents()
+            timings.append((time.perf_counter() - started) * 1e6)
+            if (index + 1) % checkpoint == 0:
+                recent = timings[-checkpoint:]
+                print(f"{label:10s} {index + 1:8d} messages   p50 {percentile(recent, 0.5):8.1f} us   "
+                      f"p99 {percentile(recent, 0.99):9.1f} us   RSS +{current_rss_mb() - rss_before:7.1f} MB", flush=True)
+        return view
+
+    view = ChatLogView(window)
+    view.setFont(QFont("Courier New"))
+    run('list view', view, lambda target, message: target.append(message, 'bot'), messages)
+
+    # Scroll up a few pages through the view, check every page on disk, then return to the bottom
+    log = view.log
+    started = time.perf_counter()
+    for _ in range(5):
+        view.verticalScrollBar().setValue(view.verticalScrollBar().minimum())
+        app.processEvents()
+    scroll_elapsed = time.perf_counter() - started
+    intact = all(text.endswith(f"#{log.first + row}") for row, (text, _) in enumerate(log.messages))
+    for page in range(len(log.page_offsets)):
+        first = page * log.page_size
+        intact = intact and all(text.endswith(f"#{first + row}") for row, (text, _) in enumerate(log.read_page(page)))
+    view.scrollToBottom()
+    app.processEvents()
+    intact = intact and len(log.messages) <= log.window and log.first + len(log.messages) == messages
+    print(f"{len(log.page_offsets)} pages on disk, {len(log.messages)} rows in memory; "
+          f"paging in 5 pages took {scroll_elapsed * 1000:.1f} ms; history check {'ok' if intact else 'FAILED'}")
+    view.close()
+    log.close()
+
+    if compare:
+        legacy = QTextEdit()
+        legacy.setReadOnly(True)
+        run('text edit', legacy, legacy_append, compare)
+        legacy.close()
+    return intact
+
+
+def random_intake_records(count, seed=0):
+    # Synthetic intake answers covering every categorical combination, odd ages and unexpected answers
+    rng = random.Random(seed)
+    choices = {column: list(mapping) + ['unsure'] for column, mapping in CATEGORY_MAPS.items()}
+    records = []
+    for _ in range(count):
+        record = {column: rng.choice(options) for column, options in choices.items()}
+        kind = rng.random()
+        if kind < 0.6:
+            record['Age'] = rng.randint(1, 100)
+        elif kind < 0.9:
+            record['Age'] = round(rng.uniform(0, 110), rng.choice([1, 2, 6]))
+        elif kind < 0.95:
+            record['Age'] = rng.choice([-3, 130, 1e6])
+        else:
+            record['Age'] = rng.choice(['', 'unknown', None])
+        records.append(record)
+    return records
+
+
+def benchmark_prediction_table(samples, ages):
+    # Check the compiled table against the forest, then compare memory and latency
+    live = HealthPredictor(DATASET_PATH, compiled=False, cache_size=0)
+    compiled = HealthPredictor(DATASET_PATH, table_ages=ages)
+    started = time.perf_counter()
+    table = PredictionTable(compiled.model, compiled.encoder, ages)
+    print(f"table: {len(table.best)} entries ({len(table.best) // len(table.representatives)} answer combinations x "
+          f"{len(table.representatives)} age buckets), {table.nbytes / 1024:.1f} KB, "
+          f"built in {(time.perf_counter() - started) * 1000:.0f} ms; forest pickle {len(pickle.dumps(live.model)) / 1e6:.1f} MB")
+
+    # Random records through both single-record and batch paths
+    records = random_intake_records(samples)
+    mismatches = sum(compiled.predict_disease(record) != live.predict_disease(record) for record in records)
+    frame = pd.DataFrame(records)
+    if not compiled.predict_many(frame).equals(live.predict_many(frame)):
+        mismatches += 1
+
+    # Every combination at each bucket edge and the nearest ages on either side of it
+    grid = table.representatives[:, None]
+    if table.edges is not None:
+        edges = table.edges[:, None]
+        grid = np.concatenate([edges, np.nextafter(edges, np.inf), np.nextafter(edges, -np.inf),
+                               np.nextafter(edges.astype(np.float32), np.float32(np.inf)).astype(np.float64)])
+    combinations = np.array(list(itertools.product(*[range(radix) for radix in table.radices])), dtype=np.float64)
+    features = np.empty((len(combinations) * len(grid), len(FEATURE_COLUMNS)), dtype=np.float64)
+    features[:, table.categorical] = np.repeat(combinations, len(grid), axis=0)
+    features[:, table.age_position] = np.tile(grid[:, 0], len(combinations))
+    if not compiled.predict_many(features).equals(live.predict_many(features)):
+        mismatches += 1
+    covered = (table.lookup(compiled.encoder.encode_frame(frame)) >= 0).mean()
+    print(f"agreement: {samples} random records and {len(features)} boundary cases, "
+          f"{mismatches} mismatches; {covered:.1%} of the records answered from the table")
+
+    for label, predictor in [('forest', live), ('table', compiled)]:
+        timings = []
+        for record in records:
+            started = time.perf_counter()
+            predictor.predict_disease(record)
+            timings.append((time.perf_counter() - started) * 1e6)
+        started = time.perf_counter()
+        predictor.predict_many(frame)
+        batch_elapsed = time.perf_counter() - started
+        print(f"{label:7s} predict_disease p50 {percentile(timings, 0.5):8.1f} us   p99 {percentile(timings, 0.99):8.1f} us   "
+              f"predict_many {samples / batch_elapsed:10.0f} records/s")
+    cache = compiled.live_prediction.cache_info()
+    print(f"fallback cache: {cache.hits} hits, {cache.misses} misses, {cache.currsize} entries")
+    return mismatches == 0
+
+
+def drifting_outcomes(dataset, count, start, stop, seed=0, noise=0.05):
+    # Confirmed outcomes resampled from the dataset whose disease mix drifts from the dataset's own
+    # (start=0) towards a skewed one (stop=1), with age jitter and a few flipped answers
+    rng = np.random.default_rng(seed)
+    drift = np.random.default_rng(1).permutation(len(dataset))
+    drifted_prior = 1.0 / (1 + np.argsort(drift)) ** 0.8
+    drifted_prior /= drifted_prior.sum()
+    drifted = rng.random(count) < np.linspace(start, stop, count)
+    rows = np.where(drifted, rng.choice(len(dataset), count, p=drifted_prior), rng.integers(len(dataset), size=count))
+    outcomes = dataset.iloc[rows][list(OUTCOME_COLUMNS) + ['Disease']].reset_index(drop=True)
+    outcomes['Age'] = (outcomes['Age'] + rng.integers(-3, 4, count)).clip(1, 100)
+    for column in ['Fever', 'Cough', 'Fatigue', 'Difficulty breathing']:
+        flip = rng.random(count) < noise
+        outcomes.loc[flip, column] = np.where(outcomes.loc[flip, column] == 'yes', 'no', 'yes')
+    return outcomes
+
+
+def log_accuracy(predictor, outcomes):
+    return float((predictor.predict_many(outcomes)['Predicted Disease'].to_numpy() == outcomes['Disease'].to_numpy()).mean())
+
+
+def benchmark_incremental(sizes, updates, test_size, cap_updates=40):
+    # For each training log size, fold the log into the base model in `updates` background-sized
+    # steps, then retrain from scratch on CSV + log, and compare cost and accuracy on late outcomes.
+    # Finally run cap_updates regular updates, enough to pass max_trees, and check the base trees survive
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        base = HealthPredictor(DATASET_PATH, ModelStore(os.path.join(scratch_dir, 'base')))
+        # Warm-started trees cannot learn diseases the base forest never saw, so the log keeps to known ones
+        dataset = pd.read_csv(DATASET_PATH)
+        dataset = dataset[dataset['Disease'].isin(set(base.model.classes_))]
+        test = drifting_outcomes(dataset, test_size, 1.0, 1.0, seed=len(sizes) + 1)
+        print(f"base model: {len(base.model.estimators_)} trees, accuracy {log_accuracy(base, test):.3f} "
+              f"on {test_size} late outcomes")
+
+        for run, size in enumerate(sizes):
+            store = HealthRecordStore(os.path.join(scratch_dir, f'log-{size}.db'))
+            model_store = ModelStore(os.path.join(scratch_dir, f'models-{size}'))
+            step = -(-size // updates)
+            updater = ModelUpdater(store, model_store=model_store, batch_size=step)
+            outcomes = drifting_outcomes(dataset, size, 0.0, 1.0, seed=run)
+            predictor = base
+            timings = []
+            for start in range(0, size, step):
+                chunk = outcomes.iloc[start:start + step]
+                store.add_outcomes(
+                    (None, features, disease, None)
+                    for features, disease in zip(chunk[list(OUTCOME_COLUMNS)].to_dict('records'), chunk['Disease']))
+                started = time.perf_counter()
+                predictor = updater.update(predictor, force=True)
+                timings.append(time.perf_counter() - started)
+            incremental_accuracy = log_accuracy(predictor, test)
+
+            started = time.perf_counter()
+            full = HealthPredictor(DATASET_PATH, artifact=ModelTrainer(DATASET_PATH, record_store=store).run(search=False))
+            full_elapsed = time.perf_counter() - started
+            full_accuracy = log_accuracy(full, test)
+            print(f"{size:8d} outcomes: {len(timings)} updates, {statistics.mean(timings):7.2f}s each "
+                  f"({statistics.mean(timings) * 1000 / step * 1000:6.1f} ms per 1k outcomes), "
+                  f"{len(predictor.model.estimators_)} trees; full retrain {full_elapsed:7.2f}s")
+            print(f"{'':8s} accuracy: incremental {incremental_accuracy:.3f}, full retrain {full_accuracy:.3f}, "
+                  f"drift {full_accuracy - incremental_accuracy:+.3f}")
+            store.close()
+
+        store = HealthRecordStore(os.path.join(scratch_dir, 'log-cap.db'))
+        updater = ModelUpdater(store, model_store=ModelStore(os.path.join(scratch_dir, 'models-cap')))
+        outcomes = drifting_outcomes(dataset, cap_updates * updater.batch_size, 0.0, 1.0, seed=len(sizes))
+        predictor = base
+        for update in range(cap_updates):
+            chunk = outcomes.iloc[update * updater.batch_size:(update + 1) * updater.batch_size]
+            store.add_outcomes(
+                (None, features, disease, None)
+                for features, disease in zip(chunk[list(OUTCOME_COLUMNS)].to_dict('records'), chunk['Disease']))
+            predictor = updater.update(predictor)
+            if (update + 1) % max(cap_updates // 4, 1) == 0:
+                print(f"{update + 1:4d} updates of {updater.batch_size}: {len(predictor.model.estimators_)} trees "
+                      f"(cap {updater.max_trees}), accuracy {log_accuracy(predictor, test):.3f}")
+        base_trees = len(base.model.estimators_)
+        kept = all(grown is original for grown, original in zip(predictor.model.estimators_[:base_trees], base.model.estimators_))
+        full = HealthPredictor(DATASET_PATH, artifact=ModelTrainer(DATASET_PATH, record_store=store).run(search=False))
+        print(f"     past the cap: all {base_trees} base trees kept: {'yes' if kept else 'NO'}; "
+              f"full retrain accuracy {log_accuracy(full, test):.3f}")
+        store.close()
+        return kept
+
+
+def synthetic_advice(count, seed=0):
+    # Advice-like snippets: the words of the real tips lead a Zipf-distributed vocabulary whose
+    # long tail of rarer terms grows with the corpus, as it does in real text
+    rng = np.random.default_rng(seed)
+    words = list(dict.fromkeys(ADVICE_TOKEN.findall(' '.join(read_medical_advice()).lower())))
+    vocabulary = np.array(words + [f"term{number}" for number in range(max(count // 2, 1000))])
+    frequency = 1.0 / np.arange(1, len(vocabulary) + 1) ** 1.1
+    lengths = rng.integers(6, 21, count)
+    tokens = vocabulary[rng.choice(len(vocabulary), lengths.sum(), p=frequency / frequency.sum())]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [' '.join(tokens[start:end]).capitalize() + '.' for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def brute_force_bm25(documents, query, k1=BM25_K1, b=BM25_B):
+    # Textbook BM25 over raw documents, to check the index against
+    tokenized = [advice_terms(document) for document in documents]
+    average_length = sum(map(len, tokenized)) / len(tokenized)
+    scores = [0.0] * len(documents)
+    for term in set(advice_terms(query)):
+        containing = [index for index, terms in enumerate(tokenized) if term in terms]
+        idf = math.log1p((len(documents) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for index in containing:
+            frequency = tokenized[index].count(term)
+            scores[index] += idf * frequency * (k1 + 1) / (
+                frequency + k1 * (1 - b + b * len(tokenized[index]) / average_length))
+    return scores
+
+
+def benchmark_advice_index(sizes, queries, k=3):
+    # Build time, file size, open time and top-k query latency against corpus size, after
+    # checking the index against brute-force BM25 and the daily rotation for repeats
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        path = os.path.join(scratch_dir, 'advice.index')
+        documents = synthetic_advice(2000, seed=99)
+        index = AdviceIndex.load(AdviceIndex.build(documents[:500], documents[500:], path))
+        rng = random.Random(0)
+        mismatches = 0
+        for _ in range(200):
+            query = ' '.join(rng.sample(advice_terms(rng.choice(documents)), 2))
+            expected = brute_force_bm25(documents, query)
+            for document, score in index.search(query, k):
+                if abs(expected[document] - score) > 1e-4 * max(1.0, score):
+                    mismatches += 1
+            top = sorted((score for score in expected if score > 0), reverse=True)[:k]
+            if [round(score, 3) for score in top] != [round(score, 3) for _, score in index.search(query, k)]:
+                mismatches += 1
+        rotation = [index.tip(number, 'Patient') for number in range(index.tips * 2)]
+        repeats = (len(set(rotation[:index.tips])) != index.tips) + (len(set(rotation[index.tips:])) != index.tips)
+        print(f"check: 200 queries against brute-force BM25, {mismatches} mismatches; "
+              f"two rounds of {index.tips} daily tips, {repeats} with repeats")
+        del index
+
+        for size in sizes:
+            documents = synthetic_advice(size, seed=size)
+            started = time.perf_counter()
+            AdviceIndex.build(documents[:size // 2], documents[size // 2:], path)
+            build_elapsed = time.perf_counter() - started
+            rss_before = current_rss_mb()
+            started = time.perf_counter()
+            index = AdviceIndex.load(path)
+            open_elapsed = time.perf_counter() - started
+            open_rss = current_rss_mb() - rss_before
+
+            # Queries of 2-5 words taken from random documents, like a message or a symptom list
+            rng = random.Random(size)
+            texts = []
+            for _ in range(queries):
+                terms = advice_terms(rng.choice(documents))
+                texts.append(' '.join(rng.sample(terms, min(len(terms), rng.randint(2, 5)))))
+            timings = []
+            for text in texts:
+                started = time.perf_counter()
+                index.search(text, k)
+                timings.append((time.perf_counter() - started) * 1e6)
+            print(f"{size:8d} documents: build {build_elapsed:6.2f}s, {os.path.getsize(path) / 1e6:6.1f} MB, "
+                  f"{index.header['terms']} terms, open {open_elapsed * 1000:4.1f} ms (RSS +{open_rss:.1f} MB); "
+                  f"top-{k} query p50 {percentile(timings, 0.5):6.0f} us   p99 {percentile(timings, 0.99):6.0f} us "
+                  f"(RSS +{current_rss_mb() - rss_before:.1f} MB as pages are touched)")
+            del index
+    return mismatches == 0 and repeats == 0
+
+
+def probe_model(engine, model_path, records):
+    # Runs in a fresh interpreter for bench-compact: load one engine, then time single-record predictions
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    if engine == 'compact':
+        predictor = CompactForest.load(model_path)
+    else:
+        predictor = HealthPredictor(DATASET_PATH, compiled=False, cache_size=0)
+    load_elapsed = time.perf_counter() - started
+    timings = []
+    for record in random_intake_records(records):
+        started = time.perf_counter()
+        predictor.predict_disease(record)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return {
+        'load_ms': load_elapsed * 1000,
+        'rss_mb': current_rss_mb() - rss_before,
+        'p50_us': percentile(timings, 0.5),
+        'p99_us': percentile(timings, 0.99),
+        'modules': sorted(name for name in ['sklearn', 'pandas', 'scipy'] if name in sys.modules),
+    }
+
+
+def benchmark_compact_forest(model_path, samples):
+    # Export the forest, check it against scikit-learn, then compare both engines in fresh processes
+    predictor = HealthPredictor(DATASET_PATH, compiled=False)
+    CompactForest.export(predictor, model_path)
+    forest = CompactForest.load(model_path)
+    pickled = len(pickle.dumps(predictor.model))
+    print(f"exported {len(forest.roots)} trees, {len(forest.feature)} nodes, {len(forest.leaf_offsets) - 1} leaves: "
+          f"{os.path.getsize(model_path) / 1024:.0f} KB file vs {pickled / 1e6:.1f} MB pickled forest")
+
+    frame = pd.concat([pd.read_csv(DATASET_PATH), pd.DataFrame(random_intake_records(samples))], ignore_index=True)
+    features = predictor.encoder.encode_frame(frame)
+    identical = np.array_equal(predictor.model.predict_proba(features), forest.predict_proba(features))
+    records = frame.head(2000).to_dict('records')
+    identical = identical and all(forest.predict_disease(record) == predictor.predict_disease(record) for record in records)
+    print(f"probabilities for {len(frame)} records bit-identical to scikit-learn: {'yes' if identical else 'NO'}")
+
+    for engine in ['sklearn', 'compact']:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), 'probe-model', engine, '--model', model_path],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{engine:8s} load {result['load_ms']:8.1f} ms   RSS +{result['rss_mb']:6.1f} MB   "
+              f"predict_disease p50 {result['p50_us']:8.1f} us   p99 {result['p99_us']:8.1f} us   "
+              f"imports: {', '.join(result['modules']) or 'numpy only'}")
+
+    started = time.perf_counter()
+    forest.classify(features)
+    compact_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    predictor.model.predict_proba(features)
+    sklearn_elapsed = time.perf_counter() - started
+    print(f"batch of {len(features)}: sklearn {len(features) / sklearn_elapsed:.0f} records/s, "
+          f"compact {len(features) / compact_elapsed:.0f} records/s")
+    return identical
+
+
+def probe_dataset(source, dataset_path):
+    # Runs in a fresh interpreter for bench-dataset: load training data the old way (csv) or through
+    # the compiled cache the trainer now uses (cache), as far as ready-to-fit feature rows.
+    # Both need pandas and scikit-learn, so those are imported before measuring
+    from sklearn.preprocessing import StandardScaler
+    pd.DataFrame, StandardScaler().fit(np.zeros((2, 1)))
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    if source == 'csv':
+        dataset = pd.read_csv(dataset_path)
+        dataset.drop_duplicates('Disease').set_index('Disease')['Medical advice'].to_dict()
+        X = FeatureEncoder.fit(dataset).encode_frame(dataset)
+        samples = len(X)
+    else:
+        X, y, w, encoder, advice, log_position = ModelTrainer(dataset_path).load()
+        samples = int(w.sum())
+    return {
+        'load_ms': (time.perf_counter() - started) * 1000,
+        'rss_mb': current_rss_mb() - rss_before,
+        'rows': len(X),
+        'samples': samples,
+    }
+
+
+def check_dataset_cache(dataset_path, dataset):
+    # The cache must describe the same training data as the CSV: the same encoder settings,
+    # the same advice, and the same feature rows and labels once weights are expanded
+    frame = pd.read_csv(dataset_path)
+    expected = FeatureEncoder.fit(frame)
+    encoder = FeatureEncoder.fit(pd.DataFrame({'Age': dataset.arrays['Age']}), dataset.weights)
+    same = (expected.age_median == encoder.age_median and np.isclose(expected.age_mean, encoder.age_mean, rtol=1e-12)
+            and np.isclose(expected.age_scale, encoder.age_scale, rtol=1e-12))
+    same = same and dataset.advice == frame.drop_duplicates('Disease').set_index('Disease')['Medical advice'].to_dict()
+    same = same and np.array_equal(encoder.encode_dataset(dataset), encoder.encode_frame(dataset.frame()))
+
+    columns = list(range(len(encoder.columns)))
+    rows = pd.DataFrame(encoder.encode_frame(frame)).assign(Disease=frame['Disease'].to_numpy(), weight=1)
+    cached = pd.DataFrame(encoder.encode_dataset(dataset)).assign(Disease=dataset.labels(), weight=dataset.weights)
+    counts = [table.groupby(columns + ['Disease'])['weight'].sum().sort_index() for table in (rows, cached)]
+    return bool(same and counts[0].equals(counts[1].astype(counts[0].dtype)))
+
+
+def benchmark_dataset_cache(sizes, jitter=0.02):
+    # Scale the dataset up by resampling its rows (a share of them with shifted ages, so some rows are new),
+    # then compare the CSV with its compiled cache: size, compile time, and load time and memory for training
+    ok = check_dataset_cache(DATASET_PATH, load_dataset(DATASET_PATH, tempfile.mkdtemp()))
+    print(f"{DATASET_PATH}: cache matches the CSV: {'yes' if ok else 'NO'}")
+    base = pd.read_csv(DATASET_PATH)
+    rng = np.random.default_rng(7)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            csv_path = os.path.join(scratch_dir, 'dataset.csv')
+            frame = base.iloc[rng.integers(len(base), size=size)].reset_index(drop=True)
+            shifted = rng.random(size) < jitter
+            frame.loc[shifted, 'Age'] += rng.integers(-5, 6, size=int(shifted.sum()))
+            frame.to_csv(csv_path, index=False)
+            del frame
+
+            started = time.perf_counter()
+            dataset = load_dataset(csv_path, os.path.join(scratch_dir, MODEL_STORE_DIR))
+            compile_elapsed = time.perf_counter() - started
+            cache_path = dataset_cache_path(csv_path, dataset.header['source_hash'],
+                                            os.path.join(scratch_dir, MODEL_STORE_DIR))
+            print(f"{size} rows: {dataset.rows} distinct, compiled in {compile_elapsed:.1f}s, "
+                  f"CSV {os.path.getsize(csv_path) / 1e6:.1f} MB -> cache {os.path.getsize(cache_path) / 1e6:.2f} MB")
+            if size == sizes[0]:
+                matches = check_dataset_cache(csv_path, dataset)
+                print(f"  cache matches the CSV: {'yes' if matches else 'NO'}")
+                ok = ok and matches
+            del dataset
+
+            for source in ['csv', 'cache']:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), 'probe-dataset', source, csv_path],
+                                        capture_output=True, text=True, check=True, cwd=scratch_dir).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"  {source:5s} load {result['load_ms']:8.0f} ms   RSS +{result['rss_mb']:7.1f} MB   "
+                      f"{result['rows']} rows for {result['samples']} samples")
+    return ok
+
+
+def benchmark_report_export(patients, checks, worker_counts):
+    # Export a synthetic record store with each worker count and report pages per second per core,
+    # then check that a stopped export resumes, that unchanged patients are skipped and that pages match
+    # the model's predictions
+    rng = random.Random(0)
+    columns = {'Fever': 'Fever', 'Cough': 'Cough', 'Fatigue': 'Fatigue', 'Difficulty Breathing': 'Difficulty breathing',
+               'Gender': 'Gender', 'Blood Pressure': 'Blood pressure', 'Cholesterol Level': 'Cholesterol level'}
+    intake = random_intake_records(1000)
+    predictor = HealthPredictor(DATASET_PATH)
+    cores = os.cpu_count()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        store = HealthRecordStore(os.path.join(scratch_dir, 'export.db'))
+        for start in range(0, patients, 10000):
+            batch = []
+            for patient in range(start, min(start + 10000, patients)):
+                for day in range(rng.randint(1, 2 * checks - 1)):
+                    record = rng.choice(intake)
+                    answers = {'day': 'fine', **{key: record[column] for key, column in columns.items()},
+                               'Age': rng.randint(1, 100)}
+                    batch.append((f"Patient {patient} <{patient % 7}>", f"2024-01-{day + 1:02d} 09:00:00", answers,
+                                  'Asthma', 'use inhalers as prescribed.'))
+            store.add_checks(batch)
+        print(f"{patients} patients, {store.count()} checks; {cores} CPU cores")
+
+        baseline = None
+        for workers in worker_counts:
+            output_dir = os.path.join(scratch_dir, f'reports-{workers}')
+            started = time.perf_counter()
+            stats = ReportExporter(store, predictor, output_dir, workers).run()
+            elapsed = time.perf_counter() - started
+            per_core = stats['rendered'] / elapsed / min(workers, cores)
+            baseline = baseline or per_core * min(workers, cores) / workers
+            print(f"{workers:3d} workers: {stats['rendered']} pages in {elapsed:6.2f}s   "
+                  f"{stats['rendered'] / elapsed:8.0f} pages/s   {per_core:8.0f} pages/s/core   "
+                  f"speed-up {stats['rendered'] / elapsed / baseline:5.2f}x")
+
+        output_dir = os.path.join(scratch_dir, 'resumed')
+        first = ReportExporter(store, predictor, output_dir, worker_counts[0]).run(limit=patients // 3)
+        second = ReportExporter(store, predictor, output_dir, worker_counts[0]).run()
+        pages = len(glob.glob(os.path.join(output_dir, '*.html'))) - 1
+        resumed = first['rendered'] == patients // 3 and second['rendered'] == patients - patients // 3 and pages == patients
+        print(f"stopped after {first['rendered']} pages, resumed with {second['rendered']} more "
+              f"({second['current']} skipped), {pages} pages on disk: {'ok' if resumed else 'MISMATCH'}")
+
+        changed = [f"Patient {patient} <{patient % 7}>" for patient in rng.sample(range(patients), min(10, patients))]
+        store.add_checks((patient, '2024-02-01 09:00:00', answers, 'Asthma', 'use inhalers as prescribed.')
+                         for patient in changed)
+        rerun = ReportExporter(store, predictor, output_dir, worker_counts[0]).run()
+        incremental = rerun['rendered'] == len(changed) and rerun['current'] == patients - len(changed)
+        print(f"after {len(changed)} new checks: {rerun['rendered']} pages rebuilt, {rerun['current']} up to date: "
+              f"{'ok' if incremental else 'MISMATCH'}")
+
+        matches = 0
+        for patient, latest, _, _, _ in next(store.iter_histories(200, 1)):
+            disease, advice = predictor.predict_disease(check_features(latest['answers']))
+            with open(os.path.join(output_dir, report_file_name(patient)), encoding='utf-8') as file:
+                page = file.read()
+            matches += (f"<h1>Health Report for {html.escape(patient)}</h1>" in page
+                        and f"Predicted Disease: {html.escape(disease)} (" in page and html.escape(advice) in page)
+        print(f"pages agree with predict_disease for {matches} of {min(200, patients)} patients")
+        store.close()
+    return resumed and incremental and matches == min(200, patients)
+
+
+# Everything above is plain definitions; heavy libraries are still unloaded at this point
+STARTUP_IMPORTED = time.perf_counter()
+
+
+def benchmark_startup(runs):
+    # Launch the app in fresh interpreters and collect import, UI-ready and model-ready times
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--startup-report'],
+                                capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        if 'error' in timings:
+            raise RuntimeError(timings['error'])
+        samples.append(timings)
+
+    for stage in ['import', 'ui_ready', 'model_ready']:
+        values = [sample[stage] * 1000 for sample in samples]
+        print(f"{stage:12s} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def benchmark_metrics(conversations):
+    # The load-test conversation in process, with metrics off, on, and off again: reports the cost
+    # per timed call and checks that uninstalling leaves every instrumented function as it was
+    originals = [(owner, attribute, owner.__dict__[attribute]) for _, owner, attribute in INSTRUMENTED_STAGES]
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        services = HealthServices(HealthRecordStore(os.path.join(scratch_dir, 'metrics.db')))
+        services.advice_index = load_advice_index()
+        services.advice_ready.set()
+        services.predictor = load_predictor()
+
+        def converse(offset):
+            messages = 0
+            started = time.perf_counter()
+            for index in range(offset, offset + conversations):
+                session = ChatSession(services)
+                for message in ["hi", "login", load_test_name(index), "health check", "fine",
+                                "yes", "no", "yes", "no", str(20 + index % 60), "female", "normal", "high",
+                                "view health report", "daily medical advice", "exit"]:
+                    reply = session.handle(message)
+                    if isinstance(reply, Deferred):
+                        reply.finish(reply.fn(*reply.args))
+                    messages += 1
+            return messages, time.perf_counter() - started
+
+        converse(0)
+        timings = {}
+        timings['off'] = converse(conversations)
+        METRICS.install()
+        timings['on'] = converse(conversations * 2)
+        calls = sum(histogram.count + len(histogram.pending) for histogram in METRICS.histograms.values())
+        METRICS.uninstall()
+        timings['off again'] = converse(conversations * 3)
+        services.record_store.close()
+
+    for label, (messages, elapsed) in timings.items():
+        print(f"metrics {label:9s} {messages} messages, {elapsed * 1e6 / messages:8.1f} us per message")
+    messages = timings['on'][0]
+    overhead = timings['on'][1] - (timings['off'][1] + timings['off again'][1]) / 2
+    print(f"{calls / messages:.1f} timed calls per message, about {overhead * 1e9 / max(calls, 1):.0f} ns each")
+    restored = all(owner.__dict__[attribute] is original for owner, attribute, original in originals)
+    print(f"instrumented functions restored after uninstall: {'yes' if restored else 'NO'}")
+    print()
+    METRICS.report()
+    return restored
+
+
+def benchmark_event_loop(records, interval_ms=10):
+    # Tick a timer on the GUI thread while a large prediction runs, and record how late each tick fires
+    app = QApplication.instance() or QApplication(sys.argv)
+    predictor = HealthPredictor(DATASET_PATH)
+    dataset = pd.read_csv(DATASET_PATH)
+    batch = pd.concat([dataset] * (records // len(dataset) + 1)).iloc[:records]
+    pool = QThreadPool()
+    tasks = []
+
+    def measure(start_prediction):
+        loop = QEventLoop()
+        lateness = []
+        last_tick = [time.perf_counter()]
+
+        def tick():
+            now = time.perf_counter()
+            lateness.append(max(0.0, (now - last_tick[0]) * 1000 - interval_ms))
+            last_tick[0] = now
+
+        timer = QTimer()
+        timer.setInterval(interval_ms)
+        timer.timeout.connect(tick)
+        timer.start()
+        QTimer.singleShot(5 * interval_ms, lambda: start_prediction(loop))
+        loop.exec_()
+        timer.stop()
+        return lateness
+
+    def on_gui_thread(loop):
+        predictor.predict_many(batch)
+        QTimer.singleShot(5 * interval_ms, loop.quit)
+
+    def on_worker_pool(loop):
+        task = Task(predictor.predict_many, batch)
+        task.signals.finished.connect(lambda _: QTimer.singleShot(5 * interval_ms, loop.quit))
+        task.signals.failed.connect(lambda _: loop.quit())
+        tasks.append(task)
+        pool.start(task)
+
+    print(f"Timer lateness while predicting {records} records ({interval_ms} ms ticks):")
+    for label, start_prediction in [('gui thread', on_gui_thread), ('worker pool', on_worker_pool)]:
+        lateness = measure(start_prediction)
+        print(f"{label:12s} p50 {percentile(lateness, 0.5):8.1f} ms   p99 {percentile(lateness, 0.99):8.1f} ms   max {max(lateness):8.1f} ms")
+    pool.waitForDone()
+
+
+def benchmark_intents(extra_patterns, messages):
+    # Compare messages per second of the compiled matcher and NLTK's sequential Chat on the same table
+    from nltk.chat.util import Chat
+
+    # Synthetic patterns go before the catch-all so they are all tried for unmatched input
+    synthetic = [[rf"symptom {index}\b(.*)", [f"Topic {index}:%1"]] for index in range(extra_patterns)]
+    table = pairs[:-1] + synthetic + pairs[-1:]
+    samples = [
+        "hello", "my name is sam", "i have fever", "can you help me with my back pain", "thanks",
+        "what is your name?", "view health report", "something nobody ever says",
+        f"symptom {extra_patterns // 2} sore throat", f"symptom {max(extra_patterns - 1, 0)}",
+    ]
+    inputs = [samples[index % len(samples)] for index in range(messages)]
+
+    nltk_chat = Chat(table, reflections)
+    matcher = IntentMatcher(table, command_keywords, reflections)
+
+    # Same random seed for both, so the randomly chosen replies must agree exactly
+    results = {}
+    for label, respond in [('nltk', nltk_chat.respond), ('compiled', lambda text: matcher.match(text).response)]:
+        random.seed(0)
+        started = time.perf_counter()
+        replies = [respond(text) for text in inputs]
+        elapsed = time.perf_counter() - started
+        results[label] = replies
+        print(f"{label:9s} {len(table):6d} patterns  {messages / elapsed:12.0f} msg/s")
+    mismatches = sum(a != b for a, b in zip(results['nltk'], results['compiled']))
+    print(f"replies differing from NLTK: {mismatches}")
+    return mismatches
+
+
+def parse_age_range(text):
+    first, _, last = text.partition('-')
+    return list(range(int(first), int(last or first) + 1))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Health Buddy AI Virtual Assistant")
+    parser.add_argument('--compact-model', metavar='PATH', help="Predict with an exported compact forest (see export-compact) instead of scikit-learn")
+    parser.add_argument('--chat-window', type=int, default=CHAT_LOG_WINDOW, help="Chat messages kept in memory; older ones are paged to disk")
+    parser.add_argument('--startup-report', action='store_true', help="Print startup timings as JSON and quit once the model is ready")
+    parser.add_argument('--profile', action='store_true', help="Time every pipeline stage and print a per-stage report on exit")
+    parser.add_argument('--cprofile', metavar='PATH', help="Capture a cProfile of the main thread and write it to PATH on exit")
+    parser.add_argument('--metrics-file', metavar='PATH', help="Time every pipeline stage and keep a Prometheus text file up to date")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT', help="Time every pipeline stage and serve Prometheus metrics on localhost:PORT/metrics")
+    commands = parser.add_subparsers(dest='command')
+
+    predict_parser = commands.add_parser('predict', help="Predict diseases for every record in a CSV file")
+    predict_parser.add_argument('input', help="CSV with Fever, Cough, Fatigue, Difficulty breathing, Age, Gender, Blood pressure and Cholesterol level columns")
+    predict_parser.add_argument('output', help="CSV to write the input rows plus predictions to")
+    predict_parser.add_argument('--chunk-size', type=int, default=10000, help="Records scored per batch")
+
+    commands.add_parser('check-encoder', help="Verify single-record and batch feature encoding agree on the dataset")
+
+    startup_parser = commands.add_parser('bench-startup', help="Measure import, UI-ready and model-ready times")
+    startup_parser.add_argument('--runs', type=int, default=5, help="Number of cold starts to measure")
+
+    intents_parser = commands.add_parser('bench-intents', help="Compare intent matching throughput with NLTK's Chat")
+    intents_parser.add_argument('--patterns', type=int, default=2000, help="Synthetic patterns added to the table")
+    intents_parser.add_argument('--messages', type=int, default=5000, help="Messages to classify")
+
+    serve_parser = commands.add_parser('serve', help="Host chat sessions for many users over a local socket")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Port to listen on (0 picks a free one)")
+    serve_parser.add_argument('--db', default=RECORD_STORE_PATH, help="Health record database")
+    # SUPPRESS leaves a --compact-model given before the subcommand in place when it is not repeated here
+    serve_parser.add_argument('--compact-model', metavar='PATH', default=argparse.SUPPRESS,
+                              help="Predict with an exported compact forest instead of scikit-learn")
+
+    load_parser = commands.add_parser('load-test', help="Run many concurrent scripted conversations against the chat service")
+    load_parser.add_argument('--sessions', type=int, default=1000, help="Concurrent conversations")
+    load_parser.add_argument('--host', default='127.0.0.1', help="Chat service host")
+    load_parser.add_argument('--port', type=int, default=0, help="Port of a running chat service (default: start one)")
+
+    import_parser = commands.add_parser('import-reports', help="Import legacy *_health_report.txt files into the record store")
+    import_parser.add_argument('folder', nargs='?', default='.', help="Folder containing the report files")
+    import_parser.add_argument('--db', default=RECORD_STORE_PATH, help="Health record database")
+
+    records_parser = commands.add_parser('bench-records', help="Benchmark the health record store")
+    records_parser.add_argument('--records', type=int, default=1000000, help="Health checks to insert")
+    records_parser.add_argument('--patients', type=int, default=100000, help="Distinct patients")
+    records_parser.add_argument('--queries', type=int, default=2000, help="Lookups timed per query type")
+
+    scheduler_parser = commands.add_parser('bench-scheduler', help="Check and benchmark the reminder scheduler on a simulated clock")
+    scheduler_parser.add_argument('--reminders', type=int, default=30000, help="Reminders to schedule")
+    scheduler_parser.add_argument('--days', type=int, default=8, help="Simulated days to run")
+
+    train_parser = commands.add_parser('train', help="Cross-validated hyperparameter search; publishes the best model for the app")
+    train_parser.add_argument('--dataset', default=DATASET_PATH, help="Training CSV (only models trained on the default are published)")
+    train_parser.add_argument('--folds', type=int, default=5, help="Cross-validation folds")
+    train_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    train_parser.add_argument('--sample', type=int, default=None, metavar='ROWS', help="Search and fit on at most this many rows")
+    train_parser.add_argument('--early-stopping', action='store_true', help="Grow forests step by step and stop when out-of-bag accuracy levels off")
+    train_parser.add_argument('--tree-step', type=int, default=25, help="Trees added per early-stopping step")
+    train_parser.add_argument('--no-publish', action='store_true', help="Report only; keep the current model")
+
+    train_parser.add_argument('--db', default=None, help="Also train on the confirmed outcomes in this health record database")
+
+    update_parser = commands.add_parser('update-model', help="Fold confirmed diagnoses from the training log into the published model")
+    update_parser.add_argument('--db', default=RECORD_STORE_PATH, help="Health record database")
+    update_parser.add_argument('--force', action='store_true', help="Update even when fewer outcomes than one batch are pending")
+
+    outcomes_parser = commands.add_parser('import-outcomes', help="Add confirmed diagnoses from a CSV to the training log")
+    outcomes_parser.add_argument('input', help="CSV with the dataset's feature columns and a Disease column")
+    outcomes_parser.add_argument('--db', default=RECORD_STORE_PATH, help="Health record database")
+
+    incremental_parser = commands.add_parser('bench-incremental', help="Compare incremental model updates with full retraining")
+    incremental_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="Training log sizes")
+    incremental_parser.add_argument('--updates', type=int, default=10, help="Updates the log is folded in with")
+    incremental_parser.add_argument('--test', type=int, default=20000, help="Late outcomes accuracy is measured on")
+    incremental_parser.add_argument('--cap-updates', type=int, default=40, help="Regular updates run to go past the tree cap")
+
+    search_advice_parser = commands.add_parser('search-advice', help="Show the advice the chat would give for a message")
+    search_advice_parser.add_argument('query', help="Message or symptoms, e.g. \"fever and cough\"")
+    search_advice_parser.add_argument('-k', type=int, default=3, help="Results to show")
+
+    advice_parser = commands.add_parser('bench-advice', help="Check the advice index and time builds and queries against corpus size")
+    advice_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000], help="Synthetic corpus sizes")
+    advice_parser.add_argument('--queries', type=int, default=2000, help="Queries timed per size")
+
+    export_parser = commands.add_parser('export-compact', help="Export the model as a compact forest that runs without scikit-learn or pandas")
+    export_parser.add_argument('output', nargs='?', default=COMPACT_FOREST_PATH, help="File to write")
+
+    compact_parser = commands.add_parser('bench-compact', help="Check the compact forest against scikit-learn and compare memory and latency")
+    compact_parser.add_argument('--model', default=os.path.join(tempfile.gettempdir(), 'healthbuddy-bench.forest'), help="Where to export the forest")
+    compact_parser.add_argument('--samples', type=int, default=20000, help="Random intake records to compare")
+
+    probe_parser = commands.add_parser('probe-model', help="Load one prediction engine and print load time, RSS and latency as JSON")
+    probe_parser.add_argument('engine', choices=['sklearn', 'compact'])
+    probe_parser.add_argument('--model', default=COMPACT_FOREST_PATH, help="Compact forest file")
+    probe_parser.add_argument('--records', type=int, default=2000, help="Records to time")
+
+    export_reports_parser = commands.add_parser('export-reports', help="Write an HTML health report for every patient in the record store")
+    export_reports_parser.add_argument('output', help="Folder for the reports; rerunning updates only what changed")
+    export_reports_parser.add_argument('--db', default=RECORD_STORE_PATH, help="Health record database")
+    export_reports_parser.add_argument('--workers', type=int, default=None, help="Rendering processes (default: one per CPU)")
+    export_reports_parser.add_argument('--history', type=int, default=REPORT_HISTORY, help="Checks listed per patient")
+    export_reports_parser.add_argument('--limit', type=int, default=None, help="Stop after this many pages; the next run continues")
+
+    bench_export_parser = commands.add_parser('bench-export', help="Measure report export throughput and check resuming and incremental runs")
+    bench_export_parser.add_argument('--patients', type=int, default=20000, help="Synthetic patients")
+    bench_export_parser.add_argument('--checks', type=int, default=3, help="Average checks per patient")
+    bench_export_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Worker counts to compare")
+
+    compile_parser = commands.add_parser('compile-dataset', help="Compile the training CSV into the columnar cache training reads")
+    compile_parser.add_argument('--dataset', default=DATASET_PATH, help="Training CSV")
+
+    dataset_parser = commands.add_parser('bench-dataset', help="Check the compiled dataset cache and compare it with reading the CSV")
+    dataset_parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 3000000], help="Scaled dataset sizes")
+
+    probe_dataset_parser = commands.add_parser('probe-dataset', help="Load training data one way and print load time and RSS as JSON")
+    probe_dataset_parser.add_argument('source', choices=['csv', 'cache'])
+    probe_dataset_parser.add_argument('dataset', help="Training CSV")
+
+    table_parser = commands.add_parser('bench-table', help="Check the precomputed prediction table against the model and time both")
+    table_parser.add_argument('--samples', type=int, default=20000, help="Random intake records to compare")
+    table_parser.add_argument('--ages', type=parse_age_range, default=None, metavar='FIRST-LAST',
+                              help="Tabulate these whole-year ages only (default: buckets from the model's age splits)")
+
+    chat_log_parser = commands.add_parser('bench-chat-log', help="Measure chat append latency and memory over a long conversation")
+    chat_log_parser.add_argument('--messages', type=int, default=100000, help="Messages to append")
+    chat_log_parser.add_argument('--window', type=int, default=CHAT_LOG_WINDOW, help="Messages kept in memory")
+    chat_log_parser.add_argument('--compare', type=int, default=0, metavar='N',
+                                 help="Also append N messages to the previous QTextEdit chat for comparison")
+
+    metrics_parser = commands.add_parser('bench-metrics', help="Measure the overhead of the stage timers")
+    metrics_parser.add_argument('--conversations', type=int, default=300, help="Scripted conversations per run")
+
+    event_loop_parser = commands.add_parser('bench-event-loop', help="Measure GUI event-loop latency while a prediction runs")
+    event_loop_parser.add_argument('--records', type=int, default=200000, help="Records in the prediction batch")
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    # Instrumentation stays uninstalled, and free, unless one of these asks for it
+    if args.profile or args.metrics_file or args.metrics_port is not None:
+        METRICS.install()
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_port)
+    if args.metrics_file:
+        export_metrics_file(args.metrics_file)
+    if args.cprofile:
+        METRICS.start_profiler()
+    if args.profile or args.cprofile:
+        atexit.register(lambda: METRICS.report(sys.stderr, METRICS.stop_profiler(args.cprofile))
+                        if args.profile else METRICS.stop_profiler(args.cprofile))
+
+    if args.command == 'predict':
+        started = time.perf_counter()
+        try:
+            count = predict_file(args.input, args.output, args.chunk_size)
+        except ValueError as error:
+            sys.exit(str(error))
+        print(f"Scored {count} records in {time.perf_counter() - started:.2f}s -> {args.output}")
+        sys.exit(0)
+
+    if args.command == 'check-encoder':
+        dataset = pd.read_csv(DATASET_PATH)
+        mismatch = check_encoder_parity(HealthPredictor(DATASET_PATH).encoder, dataset)
+        if mismatch is None:
+            print(f"Encoder parity OK for {len(dataset)} records")
+            sys.exit(0)
+        print(f"Encoder mismatch at row {mismatch[0]}: single={mismatch[1]} batch={mismatch[2]}")
+        sys.exit(1)
+
+    if args.command == 'bench-startup':
+        benchmark_startup(args.runs)
+        sys.exit(0)
+
+    if args.command == 'bench-intents':
+        sys.exit(1 if benchmark_intents(args.patterns, args.messages) else 0)
+
+    if args.command == 'serve':
+        raise_open_file_limit()
+        try:
+            asyncio.run(serve_chat(args.host, args.port, args.db, args.compact_model))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if args.command == 'load-test':
+        sys.exit(0 if load_test(args.host, args.port, args.sessions) else 1)
+
+    if args.command == 'import-reports':
+        imported = HealthRecordStore(args.db).import_text_reports(args.folder)
+        print(f"Imported {imported} health reports into {args.db}")
+        sys.exit(0)
+
+    if args.command == 'bench-records':
+        benchmark_record_store(args.records, args.patients, args.queries)
+        sys.exit(0)
+
+    if args.command == 'bench-scheduler':
+        sys.exit(0 if benchmark_scheduler(args.reminders, args.days) else 1)
+
+    if args.command == 'train':
+        trainer = ModelTrainer(args.dataset, args.folds, workers=args.workers, sample_size=args.sample,
+                               early_stopping=args.early_stopping, tree_step=args.tree_step,
+                               record_store=HealthRecordStore(args.db) if args.db else None)
+        artifact = trainer.run()
+        print_training_report(artifact['training'])
+        if not args.no_publish and os.path.abspath(args.dataset) != os.path.abspath(DATASET_PATH):
+            # The app only loads models trained on DATASET_PATH, and publishing replaces the model it uses
+            print(f"Not published: the app trains on {DATASET_PATH}, not {args.dataset}")
+        elif not args.no_publish:
+            model_store = ModelStore()
+            artifact['dataset_hash'] = model_store.dataset_hash(args.dataset)
+            model_store.save(args.dataset, artifact['dataset_hash'], artifact)
+            print(f"Published to {model_store.artifact_path(args.dataset, artifact['dataset_hash'])}")
+        sys.exit(0)
+
+    if args.command == 'update-model':
+        updater = ModelUpdater(HealthRecordStore(args.db))
+        predictor = HealthPredictor(DATASET_PATH)
+        pending = updater.pending(predictor)
+        started = time.perf_counter()
+        updated = updater.update(predictor, args.force)
+        if updated is None:
+            print(f"{pending} outcomes pending, fewer than {updater.batch_size}; nothing to do"
+                  + (" (use --force)" if pending else ""))
+        else:
+            print(f"Folded {pending} outcomes into the model in {time.perf_counter() - started:.2f}s: "
+                  f"{len(updated.model.estimators_)} trees, {updated.artifact['updates']} incremental updates since the last full training")
+        sys.exit(0)
+
+    if args.command == 'import-outcomes':
+        outcomes = pd.read_csv(args.input)
+        HealthRecordStore(args.db).add_outcomes(
+            (None, features, disease, None)
+            for features, disease in zip(outcomes.reindex(columns=list(OUTCOME_COLUMNS)).to_dict('records'), outcomes['Disease']))
+        print(f"Added {len(outcomes)} outcomes to the training log in {args.db}")
+        sys.exit(0)
+
+    if args.command == 'bench-incremental':
+        sys.exit(0 if benchmark_incremental(args.sizes, args.updates, args.test, args.cap_updates) else 1)
+
+    if args.command == 'search-advice':
+        index = load_advice_index()
+        for document, score in index.search(args.query, args.k):
+            print(f"{score:6.2f}  {index.document(document)}")
+        sys.exit(0)
+
+    if args.command == 'bench-advice':
+        sys.exit(0 if benchmark_advice_index(args.sizes, args.queries) else 1)
+
+    if args.command == 'export-compact':
+        path = CompactForest.export(HealthPredictor(DATASET_PATH, compiled=False), args.output)
+        print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB); start with --compact-model {path}")
+        sys.exit(0)
+
+    if args.command == 'bench-compact':
+        sys.exit(0 if benchmark_compact_forest(args.model, args.samples) else 1)
+
+    if args.command == 'probe-model':
+        print(json.dumps(probe_model(args.engine, args.model, args.records)))
+        sys.exit(0)
+
+    if args.command == 'export-reports':
+        started = time.perf_counter()
+        exporter = ReportExporter(HealthRecordStore(args.db), HealthPredictor(DATASET_PATH), args.output,
+                                  args.workers, args.history)
+        stats = exporter.run(args.limit)
+        print(f"Wrote {stats['rendered']} reports to {args.output} in {time.perf_counter() - started:.1f}s; "
+              f"{stats['current']} were already up to date")
+        sys.exit(0)
+
+    if args.command == 'bench-export':
+        sys.exit(0 if benchmark_report_export(args.patients, args.checks, args.workers) else 1)
+
+    if args.command == 'compile-dataset':
+        started = time.perf_counter()
+        dataset = load_dataset(args.dataset)
+        print(f"{dataset.samples} rows as {dataset.rows} distinct rows in "
+              f"{dataset_cache_path(args.dataset, dataset.header['source_hash'])} ({time.perf_counter() - started:.2f}s)")
+        sys.exit(0)
+
+    if args.command == 'bench-dataset':
+        sys.exit(0 if benchmark_dataset_cache(args.rows) else 1)
+
+    if args.command == 'probe-dataset':
+        print(json.dumps(probe_dataset(args.source, args.dataset)))
+        sys.exit(0)
+
+    if args.command == 'bench-table':
+        sys.exit(0 if benchmark_prediction_table(args.samples, args.ages) else 1)
+
+    if args.command == 'bench-chat-log':
+        sys.exit(0 if benchmark_chat_log(args.messages, args.window, args.compare) else 1)
+
+    if args.command == 'bench-metrics':
+        sys.exit(0 if benchmark_metrics(args.conversations) else 1)
+
+    if args.command == 'bench-event-loop':
+        benchmark_event_loop(args.records)
+        sys.exit(0)
+
+    app = QApplication(sys.argv)
+    chatbot_app = ChatbotApp(startup_report=args.startup_report, chat_window=args.chat_window,
+                             compact_model=args.compact_model)
+    chatbot_app.show()
+    sys.exit(app.exec_())